@@ -0,0 +1,41 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+TOKEN_CACHE_TIMEOUT = 5 * 60 if settings.CACHE_IS_SHARED else 30
+
+
+def token_cache_key(key):
+    # Hashed so raw tokens never show up in a shared cache's key listing
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def clear_token_cache(*keys):
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def clear_user_tokens(user_id):
+    clear_token_cache(*Token.objects.filter(user_id=user_id).values_list('key', flat=True))  # type: ignore
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the token (with its user) in the cache for TOKEN_CACHE_TIMEOUT,
+    so a warm request authenticates without touching the database.
+
+    Entries are dropped when the token is deleted or its user is saved (account/signals.py), in
+    every worker only if the cache is shared; otherwise (settings.CACHE_IS_SHARED) they live 30
+    seconds. Changes that bypass signals, such as queryset.update(is_active=False), apply once the
+    entry expires.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, TOKEN_CACHE_TIMEOUT)
+        return token.user, token
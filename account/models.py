@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Permission
+from django.core.cache import cache
 from django.db import models
 
+ROLE_PERMISSIONS_CACHE_KEY = 'role_permissions:{}'
+ROLE_PERMISSIONS_CACHE_TIMEOUT = 60 * 60 if settings.CACHE_IS_SHARED else 60
+
 
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -18,6 +23,19 @@ class Role(BaseModel):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def get_permission_codenames(role_id):
+        key = ROLE_PERMISSIONS_CACHE_KEY.format(role_id)
+        codenames = cache.get(key)
+        if codenames is None:
+            codenames = set(Permission.objects.filter(roles=role_id).values_list('codename', flat=True))
+            cache.set(key, codenames, ROLE_PERMISSIONS_CACHE_TIMEOUT)
+        return codenames
+
+    @staticmethod
+    def clear_permission_cache(*role_ids):
+        cache.delete_many([ROLE_PERMISSIONS_CACHE_KEY.format(role_id) for role_id in role_ids])
+
 
 class User(AbstractUser, BaseModel):
     email = models.EmailField(unique=True)
@@ -33,10 +51,16 @@ class User(AbstractUser, BaseModel):
     def __str__(self):
         return self.email or self.username
 
+    def get_role_permissions(self):
+        # Cached on the instance for the request, and in the cache backend across requests
+        if not hasattr(self, '_role_perm_cache'):
+            self._role_perm_cache = Role.get_permission_codenames(self.role_id) if self.role_id else set()  # type: ignore
+        return self._role_perm_cache
+
     def has_perm(self, perm, obj=None):
         if self.is_superuser:
             return True
-        if self.role and self.role.permissions.filter(codename=perm.split('.')[-1]).exists():
+        if perm.split('.')[-1] in self.get_role_permissions():
             return True
         return super().has_perm(perm, obj)
 
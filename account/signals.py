@@ -0,0 +1,35 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import clear_token_cache, clear_user_tokens
+from .models import Role, User
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def clear_role_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        Role.clear_permission_cache(instance.pk)
+    elif action == 'pre_clear':
+        Role.clear_permission_cache(*instance.roles.values_list('pk', flat=True))
+    elif pk_set:
+        Role.clear_permission_cache(*pk_set)
+
+
+@receiver(post_delete, sender=Role)
+def clear_deleted_role_permissions(sender, instance, **kwargs):
+    Role.clear_permission_cache(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def clear_deleted_token(sender, instance, **kwargs):
+    clear_token_cache(instance.key)
+
+
+@receiver(post_save, sender=User)
+def clear_saved_user_tokens(sender, instance, created, update_fields, **kwargs):
+    # Covers deactivation as well as role/profile edits the cached user would otherwise miss;
+    # the last_login bump on every dashboard login changes nothing the API reads
+    if not created and update_fields != frozenset({'last_login'}):
+        clear_user_tokens(instance.pk)
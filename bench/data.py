@@ -0,0 +1,94 @@
+"""
+Synthetic data for the benchmark suite.
+
+Everything is inserted with bulk_create so a dataset of tens of thousands of rows builds in seconds.
+Deterministic for a given seed, so runs against the same sizes are comparable.
+"""
+import random
+import uuid
+from dataclasses import dataclass, field
+from django.contrib.auth.models import Permission
+from rest_framework.authtoken.models import Token
+from account.models import Role, User
+from chat.models import ChatHistory, ChatSession
+from client.models import Client, ClientAssignment, ClientStageHistory, StageCount
+from client.search import build_search_text
+
+STAGES = [stage for stage, _ in Client.STAGE_CHOICES]
+CHAT_LINES = [
+    'Hi, I am looking to refinance my home',
+    'What rates do you have for a 30 year fixed?',
+    'We want to buy our first house next spring',
+    'Is a HELOC a better option for renovations?',
+    'My credit score is around 720',
+    'Can someone call me back ASAP?',
+]
+
+
+@dataclass
+class Dataset:
+    users: list = field(default_factory=list)
+    tokens: list = field(default_factory=list)
+    client_ids: list = field(default_factory=list)
+    session_ids: list = field(default_factory=list)
+
+    @property
+    def sizes(self):
+        return {
+            'users': len(self.users), 'clients': len(self.client_ids), 'sessions': len(self.session_ids),
+            'stage_history': ClientStageHistory.objects.count(),  # type: ignore
+            'assignments': ClientAssignment.objects.count(),  # type: ignore
+            'messages': ChatHistory.objects.count(),  # type: ignore
+        }
+
+
+def generate(clients=1000, users=10, history_per_client=5, sessions_per_client=1, messages_per_session=10,
+             batch_size=1000, seed=0):
+    rng = random.Random(seed)
+    data = Dataset()
+
+    # users[0] is a superuser admin; the rest are CSMs whose permissions come from a role, as in production
+    csm_role = Role.objects.create(name='CSM')
+    csm_role.permissions.set(Permission.objects.filter(content_type__app_label='client', codename='change_client'))
+    data.users = User.objects.bulk_create([  # type: ignore
+        User(username=f'csm{i}', email=f'csm{i}@bench.local', is_staff=i == 0, is_superuser=i == 0, role=None if i == 0 else csm_role)
+        for i in range(max(users, 2))
+    ])
+    data.tokens = [t.key for t in Token.objects.bulk_create([Token(user=u, key=uuid.uuid4().hex) for u in data.users])]  # type: ignore
+
+    rows = []
+    for i in range(clients):
+        stage = rng.choice(STAGES)
+        name, email, phone = f'Client {i}', f'client{i}@example.com', f'555{i:07d}'
+        rows.append(Client(
+            name=name, email=email, phone=phone, search_text=build_search_text(name, email, phone), current_stage=stage,
+            active_assignee=rng.choice(data.users), context={'intent': 'refinance', 'summary': f'Client {i}'},
+        ))
+    created = Client.objects.bulk_create(rows, batch_size=batch_size)  # type: ignore
+    data.client_ids = [c.id for c in created]
+    StageCount.shift((c.current_stage, c.active_assignee_id, 1) for c in created)
+
+    history, assignments, sessions, messages = [], [], [], []
+    for c in created:
+        path = [rng.choice(STAGES) for _ in range(history_per_client - 1)] + [c.current_stage]
+        previous = None
+        for stage in path:
+            history.append(ClientStageHistory(client=c, from_stage=previous, to_stage=stage, changed_by=c.active_assignee))
+            previous = stage
+        assignments.append(ClientAssignment(client=c, assigned_to=c.active_assignee, assigned_by=data.users[0]))
+
+        for _ in range(sessions_per_client):
+            session_id = uuid.uuid4()
+            data.session_ids.append(session_id)
+            sessions.append(ChatSession(session_id=session_id, client=c))
+            for n in range(messages_per_session):
+                messages.append(ChatHistory(
+                    session_id=session_id, client=c, message=rng.choice(CHAT_LINES),
+                    sender_type='client' if n % 2 == 0 else 'bot', message_uuid=uuid.uuid4(),
+                ))
+
+    ClientStageHistory.objects.bulk_create(history, batch_size=batch_size)  # type: ignore
+    ClientAssignment.objects.bulk_create(assignments, batch_size=batch_size)  # type: ignore
+    ChatSession.objects.bulk_create(sessions, batch_size=batch_size)  # type: ignore
+    ChatHistory.objects.bulk_create(messages, batch_size=batch_size)  # type: ignore
+    return data
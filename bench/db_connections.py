@@ -0,0 +1,89 @@
+"""
+Measure what connection reuse saves per request.
+
+Simulates N requests that each run one small query, opening and releasing the connection the way
+Django's request_started/request_finished signals do, under three configurations:
+
+    fresh       CONN_MAX_AGE=0: a new connection (TCP + TLS + auth) for every request
+    persistent  CONN_MAX_AGE + health checks: one connection per thread, reused
+    pooled      rivo.pooled_postgresql: connections shared by all threads of the process
+
+--asgi runs every request on a new thread, like Django's sync_to_async executors under ASGI,
+which is where persistent connections stop helping and the pool matters.
+
+    DATABASE_URL=postgres://... python -m bench.db_connections --requests 200 [--asgi]
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rivo.settings')
+django.setup()
+
+from django.db import connections  # noqa: E402
+from django.db.utils import ConnectionHandler  # noqa: E402
+
+
+def configurations(base):
+    configs = {
+        'fresh': dict(base, CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False),
+        'persistent': dict(base, CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True),
+    }
+    if base['ENGINE'] in ('django.db.backends.postgresql', 'rivo.pooled_postgresql'):
+        configs['pooled'] = dict(base, ENGINE='rivo.pooled_postgresql', CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=True,
+                                 POOL=base.get('POOL', {'min': 1, 'max': 4, 'timeout': 10}))
+    return configs
+
+
+def request(handler, alias):
+    connection = handler[alias]
+    connection.close_if_unusable_or_obsolete()  # request_started
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    elapsed = time.perf_counter() - started
+    connection.close_if_unusable_or_obsolete()  # request_finished
+    return elapsed
+
+
+def run(name, settings_dict, requests, asgi):
+    alias = 'default'  # a separate handler, so this doesn't touch django.db.connections
+    handler = ConnectionHandler({alias: settings_dict})
+    timings = []
+    for _ in range(requests):
+        if asgi:
+            thread = threading.Thread(target=lambda: timings.append(request(handler, alias)))
+            thread.start()
+            thread.join()
+        else:
+            timings.append(request(handler, alias))
+    handler.close_all()
+
+    timings = sorted(t * 1000 for t in timings)
+    return {
+        'mode': name, 'requests': requests, 'mean_ms': statistics.fmean(timings),
+        'p50_ms': timings[len(timings) // 2], 'p95_ms': timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--asgi', action='store_true', help='Run each request on a new thread')
+    options = parser.parse_args()
+
+    base = connections['default'].settings_dict.copy()
+    print(f"{base['ENGINE']} {'(thread per request)' if options.asgi else '(single thread)'}")
+    print(f"{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, settings_dict in configurations(base).items():
+        result = run(name, settings_dict, options.requests, options.asgi)
+        print(f"{result['mode']:<12}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Throughput and latency benchmark for the chat, client and dashboard endpoints.
+
+Builds a throwaway test database (SQLite, or a local Postgres when DATABASE_URL is set), fills it
+with bench.data, then drives each scenario in-process through django.test.Client with the fake
+LLM backend. Reports requests/sec, p50/p95/p99 latency and queries per request, and writes the
+results as JSON so runs can be compared:
+
+    python -m bench.run --clients 2000 --requests 300
+    python -m bench.run --compare bench/results/baseline.json
+    python -m bench.run --check-budgets   # exit 1 if a view runs past its QUERY_BUDGETS entry
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rivo.settings')
+os.environ.setdefault('LLM_BACKEND', 'fake')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import Client as HttpClient  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment  # noqa: E402
+from bench.data import generate  # noqa: E402
+from rivo.middleware import query_budget  # noqa: E402
+from rivo.testing import unbudgeted_views  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def scenarios(data, rng):
+    """
+    name -> callable(http) issuing one request. Each scenario picks its own random target.
+
+    `http` is logged in as the superuser (data.users[0]); the csm_* scenarios run as a CSM whose
+    permissions come from a role, so the permission checks real users hit are measured too.
+    """
+    api = {'HTTP_AUTHORIZATION': f'Token {data.tokens[0]}'}
+    csm_api = {'HTTP_AUTHORIZATION': f'Token {data.tokens[1]}'}
+    csm_http = HttpClient()
+    csm_http.force_login(data.users[1])
+
+    def chat_stream(http):
+        return http.post('/api/v1/chat/stream/', {
+            'session_id': str(rng.choice(data.session_ids)), 'message': 'Looking to refinance, what are the rates?',
+            'message_uuid': str(uuid.uuid4()),
+        }, content_type='application/json')
+
+    def chat_identify(http):
+        # First identity message of a new session: dedup lookup, new client and session link
+        return http.post('/api/v1/chat/stream/', {
+            'session_id': str(uuid.uuid4()), 'message': f'lead-{uuid.uuid4().hex[:12]}@example.com',
+            'data_type': 'email', 'message_uuid': str(uuid.uuid4()),
+        }, content_type='application/json')
+
+    return {
+        'chat_stream': chat_stream,
+        'chat_identify': chat_identify,
+        'chat_history': lambda http: http.get('/api/v1/chat/history/', {'session_id': rng.choice(data.session_ids)}),
+        'clients': lambda http: http.get('/api/v1/clients/', **api),
+        'client_detail': lambda http: http.get(f'/api/v1/clients/{rng.choice(data.client_ids)}/', **api),
+        'dashboard_home': lambda http: http.get('/dashboard/'),
+        'dashboard_client_detail': lambda http: http.get(f'/dashboard/client/{rng.choice(data.client_ids)}/'),
+        'csm_clients': lambda http: http.get('/api/v1/clients/', **csm_api),
+        'csm_mine': lambda http: http.get('/api/v1/clients/mine/', **csm_api),
+        'csm_dashboard_home': lambda http: csm_http.get('/dashboard/', {'tab': 'mine'}),
+        'csm_dashboard_client_detail': lambda http: csm_http.get(f'/dashboard/client/{rng.choice(data.client_ids)}/'),
+    }
+
+
+def measure(send, http, requests, warmup):
+    for _ in range(warmup):
+        send(http)
+
+    latencies, queries, errors, view = [], [], 0, None
+    started = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as ctx:
+            t = time.perf_counter()
+            response = send(http)
+            latencies.append((time.perf_counter() - t) * 1000)
+        queries.append(len(ctx.captured_queries))
+        errors += response.status_code >= 400
+        view = view or response.resolver_match.view_name
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests, 'errors': errors, 'rps': round(requests / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 50), 2), 'p95_ms': round(_percentile(latencies, 95), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2), 'mean_ms': round(statistics.fmean(latencies), 2),
+        'queries_mean': round(statistics.fmean(queries), 2), 'queries_max': max(queries),
+        'view': view, 'budget': query_budget(view),
+    }
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def check_budgets(results):
+    """Lines describing every scenario that ran past its view's query budget, and every unbudgeted view."""
+    failures = [
+        f"{name}: {r['view']} ran {r['queries_max']} queries, budget is {r['budget']}"
+        for name, r in results['scenarios'].items() if r['budget'] is not None and r['queries_max'] > r['budget']
+    ]
+    failures += [f'{view}: no entry in QUERY_BUDGETS' for view in unbudgeted_views()]
+    return failures
+
+
+def compare(results, baseline):
+    print(f"\n{'vs ' + baseline['meta'].get('commit', '?'):<26}{'rps':>10}{'p95':>10}{'queries':>10}")
+    for name, current in results['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        print(f"{name:<26}{_delta(current['rps'], before['rps']):>10}{_delta(current['p95_ms'], before['p95_ms']):>10}"
+              f"{_delta(current['queries_mean'], before['queries_mean']):>10}")
+
+
+def _delta(current, before):
+    return f'{(current - before) / before * 100:+.0f}%' if before else 'n/a'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--history', type=int, default=5, help='Stage history rows per client')
+    parser.add_argument('--messages', type=int, default=10, help='Chat messages per session')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', nargs='*', help='Run only these scenarios')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='Results file (default bench/results/<timestamp>.json)')
+    parser.add_argument('--compare', type=Path, help='Earlier results file to diff against')
+    parser.add_argument('--check-budgets', action='store_true', help='Fail when a view exceeds its query budget')
+    options = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        started = time.perf_counter()
+        data = generate(clients=options.clients, users=options.users, history_per_client=options.history,
+                        messages_per_session=options.messages, seed=options.seed)
+        print(f'Generated {data.sizes} in {time.perf_counter() - started:.1f}s on {connection.vendor}')
+
+        http = HttpClient()
+        http.force_login(data.users[0])
+        rng = random.Random(options.seed)
+        results = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(), 'commit': _git_commit(),
+                'database': connection.vendor, 'python': platform.python_version(), 'django': django.get_version(),
+                'dataset': data.sizes, 'requests': options.requests, 'warmup': options.warmup,
+            },
+            'scenarios': {},
+        }
+
+        print(f"\n{'scenario':<26}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}{'budget':>8}{'errors':>8}")
+        for name, send in scenarios(data, rng).items():
+            if options.only and name not in options.only:
+                continue
+            r = results['scenarios'][name] = measure(send, http, options.requests, options.warmup)
+            print(f"{name:<26}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['queries_mean']:>10}{r['budget'] or '-':>8}{r['errors']:>8}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    output = options.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f'\nWrote {output}')
+
+    if options.compare:
+        compare(results, json.loads(options.compare.read_text()))
+    if options.check_budgets:
+        failures = check_budgets(results)
+        for line in failures:
+            print(f'OVER BUDGET {line}', file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,7 @@
+import uuid
 from django.contrib import admin
-from .models import ChatHistory
+from .models import ChatArchive, ChatHistory, ChatSession
+from .search import message_matches
 
 
 @admin.register(ChatHistory)
@@ -13,6 +15,35 @@ class ChatHistoryAdmin(admin.ModelAdmin):
     ordering = ['-sent_at']
     readonly_fields = ['sent_at']
 
+    def get_search_results(self, request, queryset, search_term):
+        # A session id is matched exactly; anything else goes through the full-text index
+        if not search_term:
+            return queryset, False
+        try:
+            return queryset.filter(session_id=uuid.UUID(search_term.strip())), False
+        except ValueError:
+            return queryset.filter(message_matches(search_term)), False
+
     def message_preview(self, obj):
         """Show a preview of the message"""
-        return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
\ No newline at end of file
+        return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
+
+
+@admin.register(ChatSession)
+class ChatSessionAdmin(admin.ModelAdmin):
+    """Admin interface for ChatSession model"""
+
+    list_display = ['session_id', 'client', 'created_at']
+    search_fields = ['session_id', 'client__name', 'client__email']
+    readonly_fields = ['created_at']
+
+
+@admin.register(ChatArchive)
+class ChatArchiveAdmin(admin.ModelAdmin):
+    """Admin interface for ChatArchive model"""
+
+    list_display = ['session_id', 'client', 'message_count', 'first_sent_at', 'last_sent_at', 'archived_at']
+    search_fields = ['session_id', 'client__name', 'client__email']
+    date_hierarchy = 'last_sent_at'
+    exclude = ['payload']
+    readonly_fields = ['session_id', 'client', 'message_count', 'first_sent_at', 'last_sent_at', 'last_message_id', 'archived_at']
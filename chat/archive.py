@@ -0,0 +1,85 @@
+from itertools import groupby
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import ChatArchive, ChatHistory
+
+
+def archive_sessions(cutoff, batch_size=500):
+    """
+    Move every session whose latest message is older than `cutoff` from ChatHistory into ChatArchive.
+
+    Works `batch_size` sessions per transaction. A session that picked up new messages after it was
+    archived is merged into its existing archive row. Returns (sessions, messages) archived.
+    """
+    sessions = moved = 0
+    last_session_id = None
+    while True:
+        # Keyset over the session_id index: each batch resumes grouping where the previous one stopped
+        idle = (
+            ChatHistory.objects.order_by('session_id').values('session_id')  # type: ignore
+            .annotate(last_sent_at=Max('sent_at')).filter(last_sent_at__lt=cutoff)
+        )
+        if last_session_id:
+            idle = idle.filter(session_id__gt=last_session_id)
+        session_ids = list(idle.values_list('session_id', flat=True)[:batch_size])
+        if not session_ids:
+            return sessions, moved
+        last_session_id = session_ids[-1]
+
+        with transaction.atomic():
+            rows = list(ChatHistory.objects.filter(session_id__in=session_ids).order_by('session_id', 'id'))  # type: ignore
+            existing = ChatArchive.objects.in_bulk(session_ids)  # type: ignore
+            archives = []
+            for session_id, messages in groupby(rows, key=lambda m: m.session_id):
+                messages = list(messages)
+                if session_id in existing:
+                    messages = existing[session_id].get_messages() + messages
+                client_id = next((m.client_id for m in reversed(messages) if m.client_id), None)
+                archives.append(ChatArchive(
+                    session_id=session_id, client_id=client_id, message_count=len(messages),
+                    first_sent_at=messages[0].sent_at, last_sent_at=messages[-1].sent_at,
+                    last_message_id=messages[-1].id, payload=ChatArchive.pack(messages)
+                ))
+            ChatArchive.objects.filter(session_id__in=existing).delete()  # type: ignore
+            ChatArchive.objects.bulk_create(archives)  # type: ignore
+            # Bounded by what was read so a message landing mid-batch stays in the hot table
+            ChatHistory.objects.filter(session_id__in=session_ids, id__lte=max(m.id for m in rows)).delete()  # type: ignore
+
+        # Dropped rather than refreshed: with a shared cache every worker then re-reads the new last id
+        cache.delete_many([ChatArchive.CACHE_KEY.format(a.session_id) for a in archives])
+        sessions += len(archives)
+        moved += len(rows)
+
+
+def read_history(session_id, after_id=None, since=None, limit=100):
+    """
+    Return up to `limit + 1` messages of a session in id order, reading the archive before the hot table.
+
+    Id, not sent_at, because after_id is the cursor: buffered rows get their id at flush but keep
+    their receive time, so the two orders can disagree and a sent_at-ordered page would skip rows.
+
+    The archive is only opened when it holds messages past `after_id`, so polling a live session costs
+    the same single indexed query it did before archival existed.
+    """
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    messages = []
+    if ChatArchive.get_last_message_id(session_id) > (after_id or 0):
+        archive = ChatArchive.objects.filter(session_id=session_id).first()  # type: ignore
+        if archive:
+            messages = [
+                m for m in archive.get_messages()
+                if m.id > (after_id or 0) and (since is None or m.sent_at > since)
+            ][:limit + 1]
+            after_id = max(after_id or 0, archive.last_message_id)
+
+    if len(messages) <= limit:
+        hot = ChatHistory.objects.filter(session_id=session_id).order_by('id')  # type: ignore
+        if after_id:
+            hot = hot.filter(id__gt=after_id)
+        if since:
+            hot = hot.filter(sent_at__gt=since)
+        messages += list(hot[:limit + 1 - len(messages)])
+    return messages
@@ -0,0 +1,271 @@
+"""
+Write-behind buffer for ChatHistory inserts.
+
+Enabled with CHAT_WRITE_BUFFER: messages are acknowledged as soon as they are
+queued and inserted with bulk_create every CHAT_BUFFER_SIZE messages or
+CHAT_BUFFER_FLUSH_MS milliseconds, whichever comes first. Queued messages are
+not visible to history until that flush.
+
+With CHAT_BUFFER_LOG_DIR set, each message is also appended (and fsynced) to a
+per-process log before it is acknowledged. Every log file is held under an
+exclusive flock by its owner, so any unlocked file belongs to a dead worker and
+is replayed the next time a buffer starts. message_uuid is unique, which makes
+replaying a batch that was already inserted harmless.
+
+A message whose client was merged away while its session id was cached is re-pointed
+at the session's current client. Any other message the database rejects is logged and,
+with a log dir, appended to dead-letter.jsonl there rather than retried forever.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections
+from django.utils.dateparse import parse_datetime
+from .models import ChatHistory, ChatSession, Client
+
+logger = logging.getLogger(__name__)
+
+LOG_FIELDS = ['message_uuid', 'session_id', 'client_id', 'message', 'sender_type', 'data_type', 'sent_at']
+
+
+class ChatWriteBuffer:
+    def __init__(self, size=100, flush_ms=200, log_dir=''):
+        self.size = size
+        self.interval = flush_ms / 1000
+        self.log_dir = log_dir
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._segments = []  # (path, file) of rotated logs whose messages are not yet in the database
+        self._log = None
+
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            try:
+                self.replay()
+            except Exception:
+                # Left on disk for the next buffer to start; never worth failing the request over
+                logger.exception('Replaying chat buffer logs failed')
+            self._log = self._open_log(os.path.join(log_dir, f'chat-{os.getpid()}.log'))
+
+        threading.Thread(target=self._run, name='chat-write-buffer', daemon=True).start()
+        atexit.register(self.flush)
+
+    def add(self, **fields):
+        """Queue a message and return it unsaved (no id yet)."""
+        chat = ChatHistory(**fields)
+        with self._lock:
+            if self._log:
+                self._log.write(json.dumps(_to_row(chat)) + '\n')
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            self._pending.append(chat)
+            full = len(self._pending) >= self.size
+        if full:
+            self._wake.set()
+        return chat
+
+    def flush(self):
+        """Insert everything queued so far. Rows hit by a transient failure are put back and retried on the next flush."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            # Rotate first: if it fails nothing has been taken off the queue yet
+            rotated = self._rotate() if self._log else None
+            batch, self._pending = self._pending, []
+            segments, self._segments = self._segments, []
+            if rotated:
+                segments.append(rotated)
+
+        try:
+            leftover = self._insert(batch)
+        except Exception:
+            logger.exception('Chat buffer flush of %d message(s) failed; will retry', len(batch))
+            leftover = batch
+        if leftover:
+            with self._lock:
+                self._pending = leftover + self._pending
+                self._segments = segments + self._segments
+            return len(batch) - len(leftover)
+
+        for segment, log in segments:
+            _discard(segment, log)
+        return len(batch)
+
+    def _insert(self, rows):
+        """
+        bulk_create `rows`, falling back to one row at a time if the batch fails, so a row the
+        database rejects (IntegrityError, DataError) is dead-lettered instead of holding up the rest.
+        Returns the rows not yet inserted because of a transient error (connection lost, ...).
+        """
+        try:
+            ChatHistory.objects.bulk_create(rows, ignore_conflicts=True)  # type: ignore
+            return []
+        except Exception:
+            logger.exception('Chat buffer insert of %d message(s) failed; retrying one at a time', len(rows))
+
+        for i, chat in enumerate(rows):
+            try:
+                ChatHistory.objects.bulk_create([chat], ignore_conflicts=True)  # type: ignore
+            except (IntegrityError, DataError):
+                if _client_gone(chat.client_id) and self._repoint(chat):
+                    continue
+                self._dead_letter(chat)
+            except Exception:
+                logger.exception('Chat buffer insert failed; %d message(s) will be retried', len(rows) - i)
+                return rows[i:]
+        return []
+
+    def _repoint(self, chat):
+        """Retry a message whose client was merged away with the session's current client."""
+        chat.client_id = ChatSession.get_client_id(chat.session_id, refresh=True)
+        try:
+            ChatHistory.objects.bulk_create([chat], ignore_conflicts=True)  # type: ignore
+        except (IntegrityError, DataError):
+            return False
+        return True
+
+    def _dead_letter(self, chat):
+        row = json.dumps(_to_row(chat))
+        logger.error('Dropping chat message the database rejected: %s', row)
+        if self.log_dir:
+            # Not matched by replay()'s chat-* glob; kept for manual recovery
+            with open(os.path.join(self.log_dir, 'dead-letter.jsonl'), 'a') as dead:
+                dead.write(row + '\n')
+
+    def replay(self):
+        """Insert messages from log files left behind by workers that died before flushing."""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.log_dir, 'chat-*'))):
+            try:
+                log = self._open_log(path, mode='r')
+            except (BlockingIOError, FileNotFoundError):
+                continue  # owned by a live worker, or already handled by another one
+
+            rows = []
+            for line in log:
+                try:
+                    rows.append(_from_row(json.loads(line)))
+                except ValueError:
+                    logger.warning('Skipping truncated chat buffer entry in %s', path)
+            leftover = self._insert(rows)
+            if leftover:
+                log.close()  # unlocked again, so the next buffer to start retries it
+                continue
+            _discard(path, log)
+            replayed += len(rows)
+
+        if replayed:
+            logger.info('Replayed %d buffered chat message(s)', replayed)
+        return replayed
+
+    def _open_log(self, path, mode='a'):
+        log = open(path, mode)
+        try:
+            fcntl.flock(log, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            log.close()
+            raise
+        return log
+
+    def _rotate(self):
+        # Keep the rotated file open (and locked) until its batch is committed
+        path = self._log.name
+        segment = f'{path}.{time.time_ns()}.flushing'
+        os.rename(path, segment)
+        rotated, self._log = self._log, self._open_log(path)
+        return segment, rotated
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the thread alive; whatever is still queued goes out on the next pass
+                logger.exception('Chat buffer flush failed')
+            finally:
+                close_old_connections()
+
+
+def _to_row(chat):
+    row = {field: getattr(chat, field) for field in LOG_FIELDS}
+    row.update(message_uuid=str(chat.message_uuid), session_id=str(chat.session_id), sent_at=chat.sent_at.isoformat())
+    return row
+
+
+def _from_row(row):
+    return ChatHistory(**dict(row, sent_at=parse_datetime(row['sent_at'])))
+
+
+def _client_gone(client_id):
+    return bool(client_id) and not Client.objects.filter(pk=client_id).exists()
+
+
+def _discard(path, log):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    log.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide buffer, started on first use so forked workers each get their own."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ChatWriteBuffer(settings.CHAT_BUFFER_SIZE, settings.CHAT_BUFFER_FLUSH_MS, settings.CHAT_BUFFER_LOG_DIR)
+    return _buffer
+
+
+def save_message(**fields):
+    """
+    Persist a chat message, or queue it when the write buffer is enabled.
+
+    Returns (message, buffered). A retried message_uuid answers with the stored copy instead of failing.
+    """
+    fields['message_uuid'] = fields.get('message_uuid') or uuid.uuid4()
+    if settings.CHAT_WRITE_BUFFER:
+        return get_buffer().add(**fields), True
+    try:
+        return ChatHistory.objects.create(**fields), False  # type: ignore
+    except IntegrityError:
+        existing = ChatHistory.objects.filter(message_uuid=fields['message_uuid']).first()  # type: ignore
+        if existing is not None:
+            return existing, False
+        if not _client_gone(fields.get('client_id')):
+            raise
+    # The cached session -> client id outlived its client (merged away by another process)
+    fields['client_id'] = ChatSession.get_client_id(fields['session_id'], refresh=True)
+    return ChatHistory.objects.create(**fields), False  # type: ignore
+
+
+async def asave_message(**fields):
+    fields['message_uuid'] = fields.get('message_uuid') or uuid.uuid4()
+    if settings.CHAT_WRITE_BUFFER:
+        # The durable log fsyncs, so keep it off the event loop
+        return await sync_to_async(lambda: get_buffer().add(**fields), thread_sensitive=False)(), True
+    try:
+        return await ChatHistory.objects.acreate(**fields), False  # type: ignore
+    except IntegrityError:
+        existing = await ChatHistory.objects.filter(message_uuid=fields['message_uuid']).afirst()  # type: ignore
+        if existing is not None:
+            return existing, False
+        if not await sync_to_async(_client_gone)(fields.get('client_id')):
+            raise
+    fields['client_id'] = await ChatSession.aget_client_id(fields['session_id'], refresh=True)
+    return await ChatHistory.objects.acreate(**fields), False  # type: ignore
@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from chat.archive import archive_sessions
+
+
+class Command(BaseCommand):
+    help = 'Move chat sessions idle for longer than --days from ChatHistory into the compressed ChatArchive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Archive sessions with no message in this many days')
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions moved per transaction')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        sessions, messages = archive_sessions(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {messages} message(s) from {sessions} session(s)'))
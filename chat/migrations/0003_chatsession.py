@@ -0,0 +1,41 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_sessions(apps, schema_editor):
+    ChatHistory = apps.get_model('chat', 'ChatHistory')
+    ChatSession = apps.get_model('chat', 'ChatSession')
+    sessions = (
+        ChatHistory.objects.filter(client__isnull=False)
+        .values('session_id').annotate(client_id=models.Min('client_id')).order_by()
+    )
+    ChatSession.objects.bulk_create(
+        (ChatSession(session_id=s['session_id'], client_id=s['client_id']) for s in sessions.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0010_client_context_last_message_id'),
+        ('chat', '0002_chathistory_client_chathistory_data_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSession',
+            fields=[
+                ('session_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_sessions', to='client.client')),
+            ],
+            options={
+                'verbose_name': 'chat session',
+                'verbose_name_plural': 'chat sessions',
+            },
+        ),
+        migrations.RunPython(backfill_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0012_stagetransitiondaily'),
+        ('chat', '0003_chatsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchive',
+            fields=[
+                ('session_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('first_sent_at', models.DateTimeField()),
+                ('last_sent_at', models.DateTimeField()),
+                ('last_message_id', models.BigIntegerField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chat_archives', to='client.client')),
+            ],
+            options={
+                'verbose_name': 'chat archive',
+                'verbose_name_plural': 'chat archives',
+                'indexes': [models.Index(fields=['client', '-last_sent_at'], name='chat_chatar_client__07e34d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chathistory',
+            name='message_uuid',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='chathistory',
+            name='sent_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Frozen copies of chat.search as of this migration, so later changes there don't alter history.
+# chat.signals.reinstall_message_index brings the index up to date after every migrate.
+
+POSTGRES_CREATE = [
+    "CREATE INDEX IF NOT EXISTS chat_message_fts ON chat_chathistory USING gin (to_tsvector('english', message))",
+]
+POSTGRES_DROP = ['DROP INDEX IF EXISTS chat_message_fts']
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_search USING fts5("
+    "message, content='chat_chathistory', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS chat_message_search_ai AFTER INSERT ON chat_chathistory BEGIN "
+    "INSERT INTO chat_message_search(rowid, message) VALUES (new.id, new.message); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_message_search_ad AFTER DELETE ON chat_chathistory BEGIN "
+    "INSERT INTO chat_message_search(chat_message_search, rowid, message) VALUES ('delete', old.id, old.message); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_message_search_au AFTER UPDATE OF message ON chat_chathistory BEGIN "
+    "INSERT INTO chat_message_search(chat_message_search, rowid, message) VALUES ('delete', old.id, old.message); "
+    "INSERT INTO chat_message_search(rowid, message) VALUES (new.id, new.message); END",
+    "INSERT INTO chat_message_search(chat_message_search) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS chat_message_search_ai',
+    'DROP TRIGGER IF EXISTS chat_message_search_ad',
+    'DROP TRIGGER IF EXISTS chat_message_search_au',
+    'DROP TABLE IF EXISTS chat_message_search',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chathistory_message_uuid_alter_chathistory_sent_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE}),
+            run({'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_chat_message_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='attached',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,4 +1,12 @@
-from django.db import models
+import json
+import zlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
 
 from client.models import Client
@@ -22,6 +30,7 @@ class ChatHistory(models.Model):
     ]
 
     session_id = models.UUIDField(db_index=True)  # Groups messages by session
+    message_uuid = models.UUIDField(unique=True, null=True, blank=True, editable=False)  # Client-generated; makes inserts idempotent
     client = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True, blank=True)
     message = models.TextField()
     sender_type = models.CharField(max_length=20, choices=SENDER_TYPE_CHOICES)
@@ -31,7 +40,7 @@ class ChatHistory(models.Model):
         default='message',
         help_text='Type of data being sent (for client info collection)'
     )
-    sent_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(default=timezone.now, editable=False)  # Not auto_now_add: buffered rows keep their receive time
 
     class Meta:
         ordering = ['sent_at']
@@ -42,4 +51,126 @@ class ChatHistory(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.sender_type} - {self.data_type} - {self.sent_at}"
\ No newline at end of file
+        return f"{self.sender_type} - {self.data_type} - {self.sent_at}"
+
+
+class ChatSession(models.Model):
+    """
+    Maps a chat session to the client it identified
+    Read through the cache so message handling never scans ChatHistory
+    """
+    session_id = models.UUIDField(primary_key=True)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='chat_sessions')
+    # Linked to a client that already had the email/phone this session gave. Unverified: what it
+    # sends is only kept in the chat history, never written onto the client.
+    attached = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    CACHE_KEY = 'chat_session_client:{}'
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    class Meta:
+        verbose_name = _('chat session')
+        verbose_name_plural = _('chat sessions')
+
+    def __str__(self):
+        return f"{self.session_id} - {self.client_id}"
+
+    @classmethod
+    def get_client_id(cls, session_id, refresh=False):
+        # refresh: the cached id may outlive its client, e.g. merged away by another process
+        key = cls.CACHE_KEY.format(session_id)
+        client_id = None if refresh else cache.get(key)
+        if client_id is None:
+            client_id = cls.objects.filter(session_id=session_id).values_list('client_id', flat=True).first()
+            if client_id:
+                cache.set(key, client_id, cls.CACHE_TIMEOUT)
+        return client_id
+
+    @classmethod
+    async def aget_client_id(cls, session_id, refresh=False):
+        key = cls.CACHE_KEY.format(session_id)
+        client_id = None if refresh else await cache.aget(key)
+        if client_id is None:
+            client_id = await cls.objects.filter(session_id=session_id).values_list('client_id', flat=True).afirst()
+            if client_id:
+                await cache.aset(key, client_id, cls.CACHE_TIMEOUT)
+        return client_id
+
+    @classmethod
+    def link(cls, session_id, client, attached=False):
+        """Give a new session its client. Returns False if another request linked the session first."""
+        try:
+            with transaction.atomic():
+                cls.objects.create(session_id=session_id, client=client, attached=attached)
+        except IntegrityError:
+            return False
+        cache.set(cls.CACHE_KEY.format(session_id), client.id, cls.CACHE_TIMEOUT)
+        return True
+
+
+class ChatArchive(models.Model):
+    """
+    Cold storage for whole chat sessions moved out of ChatHistory
+    Messages are kept as zlib-compressed JSON so the hot table and its indexes stay small
+    """
+    session_id = models.UUIDField(primary_key=True)
+    client = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True, blank=True, related_name='chat_archives')
+    message_count = models.PositiveIntegerField(default=0)
+    first_sent_at = models.DateTimeField()
+    last_sent_at = models.DateTimeField()
+    last_message_id = models.BigIntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now=True)
+
+    # session_id -> last archived message id (0 when the session was never archived). archive_sessions
+    # drops the key, which only reaches other processes with a shared cache; otherwise keep entries briefly.
+    CACHE_KEY = 'chat_archive_last_id:{}'
+    CACHE_TIMEOUT = 60 * 60 if settings.CACHE_IS_SHARED else 60
+    MISS_TIMEOUT = 60
+
+    FIELDS = ['id', 'client_id', 'message', 'sender_type', 'data_type', 'sent_at', 'message_uuid']
+
+    class Meta:
+        verbose_name = _('chat archive')
+        verbose_name_plural = _('chat archives')
+        indexes = [
+            models.Index(fields=['client', '-last_sent_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id} - {self.message_count} messages"
+
+    @classmethod
+    def pack(cls, messages):
+        rows = [
+            [m.id, m.client_id, m.message, m.sender_type, m.data_type, m.sent_at.isoformat(), m.message_uuid and str(m.message_uuid)]
+            for m in messages
+        ]
+        return zlib.compress(json.dumps(rows, separators=(',', ':')).encode())
+
+    def get_messages(self):
+        """Rebuild the archived messages as unsaved ChatHistory instances, oldest first."""
+        messages = []
+        for row in json.loads(zlib.decompress(bytes(self.payload))):
+            values = dict(zip(self.FIELDS, row))
+            values['sent_at'] = parse_datetime(values['sent_at'])
+            messages.append(ChatHistory(session_id=self.session_id, **values))
+        return messages
+
+    @classmethod
+    def get_last_message_id(cls, session_id):
+        key = cls.CACHE_KEY.format(session_id)
+        last_id = cache.get(key)
+        if last_id is None:
+            last_id = cls.objects.filter(session_id=session_id).values_list('last_message_id', flat=True).first() or 0
+            # Misses expire quickly: archive_sessions can only refresh the cache of its own process
+            cache.set(key, last_id, cls.CACHE_TIMEOUT if last_id else cls.MISS_TIMEOUT)
+        return last_id
+
+
+def last_message_at(client_ref='pk'):
+    """Annotation: when the client at OuterRef(client_ref) last chatted, from the hot table or else its archived sessions."""
+    last_message = ChatHistory.objects.filter(client=OuterRef(client_ref)).order_by('-sent_at').values('sent_at')[:1]
+    last_archived = ChatArchive.objects.filter(client=OuterRef(client_ref)).order_by('-last_sent_at').values('last_sent_at')[:1]  # type: ignore
+    return Coalesce(Subquery(last_message), Subquery(last_archived))
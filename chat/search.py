@@ -0,0 +1,66 @@
+"""
+Full-text index over chat message text.
+
+    PostgreSQL  GIN index on to_tsvector('english', message).
+    SQLite      FTS5 external-content table `chat_message_search` (porter stemming), kept in
+                sync by triggers.
+
+Every word of the query must match, as a prefix of a stemmed word.
+
+Only the hot chat_chathistory table is indexed; sessions moved to ChatArchive are not searchable.
+"""
+from django.db import connection
+from django.db.models import BigIntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.expressions import RawSQL
+from client.search import drop_sqlite_fts, fts_query, install_sqlite_fts, search_words
+from .models import ChatHistory, ChatSession
+
+
+def install_message_index(connection):
+    """Create the index if it is missing. Idempotent; run by the migration and after every migrate."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS chat_message_fts ON chat_chathistory "
+                "USING gin (to_tsvector('english', message))"
+            )
+        elif connection.vendor == 'sqlite':
+            install_sqlite_fts(cursor, 'chat_message_search', 'chat_chathistory', 'message', 'porter unicode61')
+
+
+def drop_message_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS chat_message_fts')
+        elif connection.vendor == 'sqlite':
+            drop_sqlite_fts(cursor, 'chat_message_search', 'chat_chathistory', 'message')
+
+
+def message_matches(term):
+    """Q for ChatHistory rows whose message contains every word of `term` (see client.search.fts_query)."""
+    words = search_words(term)
+    if not words:
+        return Q(pk__in=[])
+    if connection.vendor == 'postgresql':
+        # Same expression as chat_message_fts, so the planner uses the index
+        return Q(id__in=RawSQL(
+            "SELECT id FROM chat_chathistory WHERE to_tsvector('english', message) @@ to_tsquery('english', %s)",
+            [fts_query(words)],
+        ))
+    if connection.vendor == 'sqlite':
+        return Q(id__in=RawSQL(
+            'SELECT rowid FROM chat_message_search WHERE chat_message_search MATCH %s', [fts_query(words)]
+        ))
+    return Q(message__icontains=term)
+
+
+def matching_messages(term):
+    """
+    ChatHistory rows matching `term`, annotated with `owner_id`: the message's client or, for
+    messages sent before the visitor identified themselves (client unset), the session's client.
+    """
+    session_client = ChatSession.objects.filter(session_id=OuterRef('session_id')).values('client_id')[:1]
+    return ChatHistory.objects.filter(message_matches(term)).annotate(
+        owner_id=Coalesce('client_id', Subquery(session_client), output_field=BigIntegerField())
+    )
@@ -8,13 +8,14 @@ class ChatHistorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ChatHistory
-        fields = ['id', 'session_id', 'message', 'sender_type', 'data_type', 'sent_at']
-        read_only_fields = ['id', 'sent_at']
+        fields = ['id', 'message_uuid', 'session_id', 'message', 'sender_type', 'data_type', 'sent_at']
+        read_only_fields = ['id', 'message_uuid', 'sent_at']
 
 
 class SendMessageSerializer(serializers.Serializer):
     """Serializer for sending a message to a chat session"""
     session_id = serializers.UUIDField()
+    message_uuid = serializers.UUIDField(required=False)
     message = serializers.CharField()
     sender_type = serializers.ChoiceField(
         choices=['bot', 'client'],
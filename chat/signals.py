@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate
+from django.dispatch import receiver
+from .models import ChatArchive, ChatSession
+from .search import install_message_index
+
+
+@receiver(post_delete, sender=ChatSession)
+def clear_session_client(sender, instance, **kwargs):
+    cache.delete(ChatSession.CACHE_KEY.format(instance.session_id))
+
+
+@receiver(post_delete, sender=ChatArchive)
+def clear_archive_marker(sender, instance, **kwargs):
+    cache.delete(ChatArchive.CACHE_KEY.format(instance.session_id))
+
+
+@receiver(post_migrate)
+def reinstall_message_index(sender, app_config, using, **kwargs):
+    # SQLite rebuilds chat_chathistory for many ALTERs, which drops the FTS triggers
+    # Only once the migration that created it is applied, so migrating backwards doesn't bring it back
+    connection = connections[using]
+    if app_config.name == 'chat' and ('chat', '0006_chat_message_index') in MigrationRecorder(connection).applied_migrations():
+        install_message_index(connection)
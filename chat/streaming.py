@@ -0,0 +1,81 @@
+"""
+Server-Sent Events variant of ChatViewSet.stream.
+
+Runs fully async under ASGI (see rivo/asgi.py): the message is persisted and
+the summary produced with async ORM calls and the async OpenAI client, so a
+worker can hold many open sessions while waiting on the model.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from client.jobs import enqueue_summary, unsummarized_messages
+from client.services import asummarize_chat_history
+from .buffer import asave_message
+from .models import ChatSession
+from .serializers import ChatHistorySerializer, SendMessageSerializer
+from .views import identify_client, set_client_field
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def stream_events(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    serializer = SendMessageSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    response = StreamingHttpResponse(_events(**serializer.validated_data), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Django 4.2's csrf_exempt decorator would wrap this coroutine in a sync function
+stream_events.csrf_exempt = True  # type: ignore
+
+
+async def _events(session_id, message, sender_type, data_type='message', message_uuid=None):
+    client_id = await ChatSession.aget_client_id(session_id)
+    client = None
+
+    if data_type in ['name', 'email', 'phone']:
+        client, owned = await sync_to_async(identify_client)(session_id, data_type, message, session_exists=client_id is not None)
+        client_id = client.id
+        if not owned:
+            # Attached to an existing client by email/phone: nothing about it goes back to the caller
+            client = None
+        else:
+            if set_client_field(client, data_type, message):
+                await client.asave()
+            yield sse_event('client', {'id': client.id, 'is_complete': client.is_complete})
+
+    chat, _ = await asave_message(
+        message_uuid=message_uuid, session_id=session_id, client_id=client_id,
+        message=message, sender_type=sender_type, data_type=data_type
+    )
+    yield sse_event('message', ChatHistorySerializer(chat).data)
+
+    if client and client.is_complete:
+        messages = [m async for m in unsummarized_messages(client, session_id)]
+        try:
+            context = await asummarize_chat_history(messages, previous_context=client.context, fail_silently=False)
+        except Exception:
+            await sync_to_async(enqueue_summary)(client, session_id)
+            yield sse_event('summary', {'status': 'queued'})
+        else:
+            if messages:
+                await sync_to_async(client.update_context)(context, messages[-1]['id'])
+            await sync_to_async(client.initialize)()
+            # The context stays server-side; this endpoint is public
+            yield sse_event('summary', {'status': 'done'})
+
+    yield sse_event('done', {'id': chat.id, 'message_uuid': chat.message_uuid})
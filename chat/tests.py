@@ -0,0 +1,88 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+from .archive import archive_sessions, read_history
+from .buffer import ChatWriteBuffer
+from client.models import Client
+from .models import ChatArchive, ChatHistory, ChatSession
+
+
+class ChatWriteBufferTests(TestCase):
+    def test_failed_flush_keeps_rows_for_the_next_one(self):
+        buffer = ChatWriteBuffer(size=100, flush_ms=60 * 60 * 1000)
+        session_id = uuid.uuid4()
+        for text in ('hello', 'again'):
+            buffer.add(session_id=session_id, message=text, sender_type='client', message_uuid=uuid.uuid4())
+
+        insert, calls = buffer._insert, []
+
+        def fail_once(rows):
+            calls.append(rows)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return insert(rows)
+
+        with mock.patch.object(buffer, '_insert', side_effect=fail_once), self.assertLogs('chat.buffer', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+            self.assertFalse(ChatHistory.objects.filter(session_id=session_id).exists())
+            self.assertEqual(buffer.flush(), 2)
+
+        self.assertEqual(
+            list(ChatHistory.objects.filter(session_id=session_id).order_by('id').values_list('message', flat=True)),
+            ['hello', 'again'],
+        )
+
+
+class ChatHistoryPagingTests(TestCase):
+    def test_after_id_pages_every_message_once_when_sent_at_disagrees_with_id(self):
+        session_id, now = uuid.uuid4(), timezone.now()
+        # Inserted in this order, but sent_at runs the other way (e.g. flushed late from the write buffer)
+        sent = [now, now - timedelta(seconds=5), now - timedelta(seconds=10), now + timedelta(seconds=1)]
+        ids = [
+            ChatHistory.objects.create(session_id=session_id, message=f'm{i}', sender_type='client', sent_at=at).id
+            for i, at in enumerate(sent)
+        ]
+
+        seen, after_id = [], None
+        for _ in range(len(ids) + 1):
+            params = {'session_id': str(session_id), 'limit': 1, **({'after_id': after_id} if after_id else {})}
+            body = self.client.get('/api/v1/chat/history/', params).json()
+            seen += [m['id'] for m in body['messages']]
+            after_id = body['next_after_id']
+            if not body['has_more']:
+                break
+
+        self.assertEqual(seen, ids)
+
+
+class IdentifyClientTests(TestCase):
+    def test_email_on_file_in_another_case_attaches_the_session(self):
+        existing = Client.objects.create(name='Foo Bar', email='Foo@X.com')
+        session_id = uuid.uuid4()
+
+        response = self.client.post('/api/v1/chat/stream/', {
+            'session_id': str(session_id), 'message': 'foo@x.com', 'data_type': 'email', 'message_uuid': str(uuid.uuid4()),
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Client.objects.count(), 1)
+        session = ChatSession.objects.get(session_id=session_id)
+        self.assertEqual((session.client_id, session.attached), (existing.pk, True))
+
+
+class ChatArchiveTests(TestCase):
+    def test_session_archived_again_is_read_past_the_cached_last_id(self):
+        session_id, old = uuid.uuid4(), timezone.now() - timedelta(days=100)
+        first = ChatHistory.objects.create(session_id=session_id, message='first', sender_type='client', sent_at=old)
+        archive_sessions(timezone.now() - timedelta(days=90))
+        self.assertEqual(ChatArchive.get_last_message_id(session_id), first.id)  # cached now
+
+        second = ChatHistory.objects.create(session_id=session_id, message='second', sender_type='client', sent_at=old)
+        archive_sessions(timezone.now() - timedelta(days=90))
+
+        self.assertIsNone(cache.get(ChatArchive.CACHE_KEY.format(session_id)))
+        self.assertEqual([m.id for m in read_history(session_id, after_id=first.id)], [second.id])
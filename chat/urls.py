@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .streaming import stream_events
 from .views import ChatViewSet
 
 router = DefaultRouter()
 router.register('', ChatViewSet, basename='chat')
 
 urlpatterns = [
+    path('stream/events/', stream_events, name='chat-stream-events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,10 +1,21 @@
+import hashlib
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from client.services import summarize_chat_history
-from .models import ChatHistory, Client
+from client.jobs import enqueue_summary
+from client.dedup import find_existing
+from client.search import normalize_phone
+from .archive import read_history
+from .buffer import save_message
+from .models import ChatSession, Client
 from .serializers import ChatHistorySerializer, SendMessageSerializer
-import re
+
+HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 500
 
 
 class ChatViewSet(viewsets.ViewSet):
@@ -18,42 +29,118 @@ class ChatViewSet(viewsets.ViewSet):
         message = serializer.validated_data['message']
         sender_type = serializer.validated_data['sender_type']
         data_type = serializer.validated_data.get('data_type', 'message')
+        message_uuid = serializer.validated_data.get('message_uuid')
 
-        client = self._get_client(session_id)
+        client_id = ChatSession.get_client_id(session_id)
 
         if data_type in ['name', 'email', 'phone']:
-            if not client:
-                client = Client.objects.create()
-                ChatHistory.objects.filter(session_id=session_id, client__isnull=True).update(client=client)
+            client, owned = identify_client(session_id, data_type, message, session_exists=client_id is not None)
+            client_id = client.id
 
-            self._update_client(client, data_type, message)
+            if owned:
+                self._update_client(client, data_type, message)
 
-            if client.is_complete:
-                messages = ChatHistory.objects.filter(session_id=session_id, data_type='message').values('sender_type', 'message')
-                client.initialize(context=summarize_chat_history(list(messages)))
+                if client.is_complete:
+                    enqueue_summary(client, session_id)
 
-        chat = ChatHistory.objects.create(
-            session_id=session_id, client=client, message=message, sender_type=sender_type, data_type=data_type
+        chat, buffered = save_message(
+            message_uuid=message_uuid, session_id=session_id, client_id=client_id,
+            message=message, sender_type=sender_type, data_type=data_type
         )
-        return Response(ChatHistorySerializer(chat).data, status=status.HTTP_201_CREATED)
+        return Response(ChatHistorySerializer(chat).data, status=status.HTTP_202_ACCEPTED if buffered else status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
     def history(self, request):
-        session_id = request.query_params.get('session_id')
+        params = request.query_params
+        session_id = params.get('session_id')
         if not session_id:
             return Response({'error': 'session_id required'}, status=status.HTTP_400_BAD_REQUEST)
-        messages = ChatHistory.objects.filter(session_id=session_id)
-        return Response({'session_id': session_id, 'messages': ChatHistorySerializer(messages, many=True).data})
 
-    def _get_client(self, session_id):
-        chat = ChatHistory.objects.filter(session_id=session_id, client__isnull=False).first()
-        return chat.client if chat else None
+        try:
+            after_id = int(params['after_id']) if params.get('after_id') else None
+            since = None
+            if params.get('since'):
+                since = parse_datetime(params['since'])
+                if since is None:
+                    raise ValueError(params['since'])
+            limit = max(1, min(int(params.get('limit', HISTORY_PAGE_SIZE)), MAX_HISTORY_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'Invalid after_id, since or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            messages = read_history(session_id, after_id, since, limit)
+        except ValidationError:
+            return Response({'error': 'Invalid session_id'}, status=status.HTTP_400_BAD_REQUEST)
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+
+        # Pollers resend these validators and get a bodyless 304 until something new arrives
+        ids = f"{messages[0].id}-{messages[-1].id}-{len(messages)}" if messages else 'empty'
+        etag = hashlib.md5(f"{request.get_full_path()}:{ids}".encode()).hexdigest()
+        last_modified = max((m.sent_at for m in messages), default=None)
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=f'"{etag}"', last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response({
+            'session_id': session_id, 'messages': ChatHistorySerializer(messages, many=True).data,
+            'next_after_id': messages[-1].id if messages else after_id, 'has_more': has_more
+        })
+        response['ETag'] = f'"{etag}"'
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
 
     def _update_client(self, client, data_type, message):
-        if data_type == 'name':
-            client.name = message.strip().title()
-        elif data_type == 'email':
-            client.email = message.strip().lower()
-        elif data_type == 'phone':
-            client.phone = re.sub(r'\D', '', message)
-        client.save()
+        if set_client_field(client, data_type, message):
+            client.save()
+
+
+def clean_client_field(data_type, message):
+    if data_type == 'name':
+        return message.strip().title()
+    if data_type == 'email':
+        return message.strip().lower()
+    if data_type == 'phone':
+        return normalize_phone(message)
+
+
+def set_client_field(client, data_type, message):
+    """Set the field an identity message carries; False when the client already had that value."""
+    value = clean_client_field(data_type, message)
+    if getattr(client, data_type) == value:
+        return False
+    setattr(client, data_type, value)
+    return True
+
+
+def identify_client(session_id, data_type, message, session_exists=True):
+    """
+    Return (client, owned) for an identity message: the session's client, and whether the
+    message may be written onto it.
+
+    A session without a client whose email or phone is already on file is attached to that
+    client instead of creating a duplicate lead. Anyone can type an email, so an attached session
+    is unverified: what it sends stays in the chat history and never changes the client.
+    Merging duplicates is left to staff (`manage.py merge_duplicate_clients`).
+
+    Pass session_exists=False when ChatSession.get_client_id just came back empty to skip
+    looking the session up again. A new client is created with the message's field already set.
+    """
+    if session_exists:
+        session = ChatSession.objects.select_related('client').filter(session_id=session_id).first()
+        if session:
+            return session.client, not session.attached
+    value = clean_client_field(data_type, message)
+    existing = find_existing(data_type, value)
+    if existing:
+        if ChatSession.link(session_id, existing, attached=True):
+            return existing, False
+        return identify_client(session_id, data_type, message)
+    client = Client.objects.create(**{data_type: value})
+    if ChatSession.link(session_id, client):
+        return client, True
+    # Another request for this session got there first
+    client.delete()
+    return identify_client(session_id, data_type, message)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Client, ClientStageHistory, ClientAssignment
+from django.utils import timezone
+from .models import Client, ClientStageHistory, ClientAssignment, StageCount, StageTransitionDaily, SummaryJob
+from .search import search_clients
 
 
 @admin.register(Client)
@@ -9,6 +11,13 @@ class ClientAdmin(admin.ModelAdmin):
     search_fields = ['name', 'email', 'phone']
     readonly_fields = ['context', 'created_at', 'updated_at']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Served from the search index rather than icontains scans over every column
+        if not search_term:
+            return queryset, False
+        ids = [c.pk for c in search_clients(queryset, search_term, limit=200)]
+        return queryset.filter(pk__in=ids), False
+
 
 @admin.register(ClientStageHistory)
 class ClientStageHistoryAdmin(admin.ModelAdmin):
@@ -24,3 +33,32 @@ class ClientAssignmentAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'created_at']
     search_fields = ['client__name', 'assigned_to__email']
     readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(SummaryJob)
+class SummaryJobAdmin(admin.ModelAdmin):
+    list_display = ['client', 'status', 'attempts', 'run_after', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['client__name', 'client__email']
+    readonly_fields = ['created_at', 'updated_at']
+    actions = ['retry']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry(self, request, queryset):
+        # Running jobs are left to their worker
+        queued = queryset.exclude(status='running').update(
+            status='pending', attempts=0, dirty=False, run_after=timezone.now(), last_error=''
+        )
+        self.message_user(request, f'Queued {queued} job(s).')
+
+
+@admin.register(StageTransitionDaily)
+class StageTransitionDailyAdmin(admin.ModelAdmin):
+    list_display = ['date', 'csm', 'from_stage', 'to_stage', 'count', 'total_duration']
+    list_filter = ['date', 'to_stage']
+
+
+@admin.register(StageCount)
+class StageCountAdmin(admin.ModelAdmin):
+    list_display = ['stage', 'csm', 'count']
+    list_filter = ['stage']
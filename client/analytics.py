@@ -0,0 +1,110 @@
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import islice
+from django.db import transaction
+from django.db.models import Count, Sum
+from .models import Client, ClientAssignment, ClientStageHistory, StageCount, StageTransitionDaily
+
+BUCKET_FIELDS = [field for field, _ in StageTransitionDaily.DURATION_BUCKETS]
+TERMINAL_STAGES = {'lost', 'closed', 'rejected'}
+PIPELINE = [stage for stage, _ in Client.STAGE_CHOICES if stage not in TERMINAL_STAGES]
+
+
+def _percentile_hours(buckets, total, p):
+    """Upper bound (hours) of the bucket holding the p-th percentile; None if it falls in the open-ended bucket."""
+    seen = 0
+    for field, bound in StageTransitionDaily.DURATION_BUCKETS:
+        seen += buckets[field]
+        if total and seen >= total * p:
+            return bound / 3600 if bound else None
+    return None
+
+
+def stage_report(start, end, csm_id=None):
+    """Funnel, conversion and time-in-stage figures from the precomputed daily rows."""
+    rows = StageTransitionDaily.objects.filter(date__range=(start, end))
+    if csm_id:
+        rows = rows.filter(csm_id=csm_id)
+
+    entered = defaultdict(int)
+    for r in rows.values('to_stage').annotate(n=Sum('count')).order_by():
+        entered[r['to_stage']] = r['n']
+
+    time_in_stage = []
+    grouped = (
+        rows.exclude(from_stage='').values('csm_id', 'csm__email', 'from_stage')
+        .annotate(n=Sum('count'), seconds=Sum('total_duration'), **{f: Sum(f) for f in BUCKET_FIELDS})
+        .order_by('csm__email', 'from_stage')
+    )
+    for g in grouped:
+        time_in_stage.append({
+            'csm': g['csm__email'], 'stage': g['from_stage'], 'transitions': g['n'],
+            'avg_hours': round(g['seconds'] / g['n'] / 3600, 2),
+            'p50_hours': _percentile_hours(g, g['n'], 0.5),
+            'p90_hours': _percentile_hours(g, g['n'], 0.9),
+        })
+
+    counts = StageCount.objects.all()
+    if csm_id:
+        counts = counts.filter(csm_id=csm_id)
+    counts = {r['stage']: r['n'] for r in counts.values('stage').annotate(n=Sum('count')).order_by()}
+
+    return {
+        'stage_counts': {stage: counts.get(stage, 0) for stage, _ in Client.STAGE_CHOICES},
+        'entered': dict(entered),
+        'conversion': [
+            {'from': a, 'to': b, 'rate': round(entered[b] / entered[a], 4) if entered[a] else None}
+            for a, b in zip(PIPELINE, PIPELINE[1:])
+        ],
+        'time_in_stage': time_in_stage,
+    }
+
+
+def _client_transitions(client_created_at, history, assignments):
+    """Replay one client's history, attributing each transition to whoever was assigned at the time."""
+    assigned_at = [at for at, _ in assignments]
+    entered_at = client_created_at
+    for from_stage, to_stage, at in history:
+        i = bisect_right(assigned_at, at)
+        csm_id = assignments[i - 1][1] if i else None
+        yield at, csm_id, from_stage, to_stage, (at - entered_at).total_seconds()
+        entered_at = at
+
+
+def rebuild_stage_counts():
+    """Recompute StageCount from the clients' current stage and assignee."""
+    StageCount.objects.all().delete()
+    StageCount.objects.bulk_create([
+        StageCount(stage=r['current_stage'], csm_id=r['active_assignee_id'], count=r['n'])
+        for r in Client.objects.values('current_stage', 'active_assignee_id').annotate(n=Count('id')).order_by()
+    ])
+
+
+@transaction.atomic
+def rebuild_stage_analytics(batch_size=1000):
+    """
+    Recompute every StageTransitionDaily row from ClientStageHistory, and StageCount from the clients.
+    Returns the number of transitions replayed.
+    """
+    rebuild_stage_counts()
+    StageTransitionDaily.objects.all().delete()
+    clients = Client.objects.order_by('id').values_list('id', 'created_at').iterator(chunk_size=batch_size)
+    replayed = 0
+    while batch := list(islice(clients, batch_size)):
+        ids = [pk for pk, _ in batch]
+        history, assignments = defaultdict(list), defaultdict(list)
+        for client_id, from_stage, to_stage, at in (
+            ClientStageHistory.objects.filter(client_id__in=ids).order_by('created_at', 'id')  # type: ignore
+            .values_list('client_id', 'from_stage', 'to_stage', 'created_at')
+        ):
+            history[client_id].append((from_stage, to_stage, at))
+        for client_id, assigned_to_id, at in (
+            ClientAssignment.objects.filter(client_id__in=ids).order_by('created_at', 'id')  # type: ignore
+            .values_list('client_id', 'assigned_to_id', 'created_at')
+        ):
+            assignments[client_id].append((at, assigned_to_id))
+
+        transitions = [t for pk, created_at in batch for t in _client_transitions(created_at, history[pk], assignments[pk])]
+        StageTransitionDaily.record(transitions)
+        replayed += len(transitions)
+    return replayed
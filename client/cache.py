@@ -0,0 +1,63 @@
+"""
+Cache of the serialized client detail payload.
+
+Entries are keyed by client id and only served while they match the
+client's updated_at, so any save is enough to make them stale; Client.save,
+Client.delete and the bulk queryset helpers also delete them outright.
+"""
+from django.core.cache import cache
+from .pagination import keyset_page
+
+HISTORY_PREVIEW_SIZE = 20
+DETAIL_CACHE_KEY = 'client_detail:{}'
+DETAIL_CACHE_TIMEOUT = 60 * 60
+STATS_CACHE_KEY = 'client_detail_cache:{}'
+
+
+def _count(outcome):
+    key = STATS_CACHE_KEY.format(outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def serialize_history(h):
+    return {'from': h.from_stage, 'to': h.to_stage, 'by': h.changed_by.email if h.changed_by else None, 'at': h.created_at.isoformat(), 'remarks': h.remarks}
+
+
+def build_detail_payload(client):
+    # Only the latest entries; older ones are paged in from the stage history endpoint
+    history, history_next = keyset_page(client.stage_history.select_related('changed_by'), limit=HISTORY_PREVIEW_SIZE)
+    return {
+        'client': {'id': client.id, 'name': client.name, 'email': client.email, 'phone': client.phone, 
+                   'stage': client.current_stage, 'context': client.context},
+        'history': [serialize_history(h) for h in history], 'history_next': history_next, 'stages': dict(client.STAGE_CHOICES)
+    }
+
+
+def get_detail_payload(client):
+    """Return (payload, hit) for a client, rebuilding and caching it on a miss."""
+    key = DETAIL_CACHE_KEY.format(client.pk)
+    entry = cache.get(key)
+    if entry and entry['updated_at'] == client.updated_at:
+        _count('hits')
+        return entry['payload'], True
+
+    _count('misses')
+    payload = build_detail_payload(client)
+    cache.set(key, {'updated_at': client.updated_at, 'payload': payload}, DETAIL_CACHE_TIMEOUT)
+    return payload, False
+
+
+def invalidate_detail(*client_ids):
+    cache.delete_many([DETAIL_CACHE_KEY.format(pk) for pk in client_ids])
+
+
+def detail_cache_stats():
+    stats = cache.get_many([STATS_CACHE_KEY.format('hits'), STATS_CACHE_KEY.format('misses')])
+    return {
+        'hits': stats.get(STATS_CACHE_KEY.format('hits'), 0),
+        'misses': stats.get(STATS_CACHE_KEY.format('misses'), 0),
+    }
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'{name} circuit is open; retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over a sliding time window, shared by the threads of a process.
+
+    While closed, call outcomes from the last `window` seconds are kept. Once at least `min_calls`
+    are recorded and the failed share reaches `failure_rate`, the breaker opens and rejects calls
+    with CircuitOpen for `cooldown` seconds. It then lets a single trial call through: success
+    closes it again, failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=10, window=60, cooldown=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (monotonic time, failed)
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, self._opened_at + self.cooldown - time.monotonic())
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go ahead now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise CircuitOpen(self.name, max(remaining, 0))
+            self._trial = True
+
+    def record(self, failed):
+        now = time.monotonic()
+        with self._lock:
+            if self._trial:
+                self._trial = False
+                self._outcomes.clear()
+                self._opened_at = now if failed else None
+                return
+
+            self._outcomes.append((now, failed))
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+            failures = sum(f for _, f in self._outcomes)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._opened_at = now
+                self._outcomes.clear()
@@ -0,0 +1,195 @@
+"""
+Duplicate client detection and merging.
+
+Returning visitors start a new chat session, which used to mean a new Client every time. When a
+new session's first email or phone is already on file (find_existing), the chat endpoints attach
+the session to that client without touching it (chat.views.identify_client). Merging is staff-side
+only: `manage.py merge_duplicate_clients` folds the duplicates in the table (find_duplicate_groups,
+merge_clients).
+
+Of a set of duplicates the survivor is the most worked client: one past `lead`, then one with an
+assignee, then the oldest.
+"""
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When, Window
+from django.db.models.functions import Lower
+from django.utils import timezone
+from chat.models import ChatArchive, ChatHistory, ChatSession
+from .cache import invalidate_detail
+from .models import Client, ClientAssignment, ClientStageHistory, StageCount, SummaryJob
+from .search import build_search_text
+
+IDENTITY_FIELDS = ('email', 'phone')
+SURVIVOR_ORDER = [
+    Case(When(current_stage='lead', then=Value(1)), default=Value(0)),
+    Case(When(active_assignee__isnull=True, then=Value(1)), default=Value(0)),
+    'created_at', 'id',
+]
+
+
+def survivor_rank(stage, active_assignee_id, created_at, pk):
+    """Python twin of SURVIVOR_ORDER; the lowest rank survives."""
+    return (stage == 'lead', active_assignee_id is None, created_at, pk)
+
+
+def find_existing(field, value, exclude=None):
+    """
+    The client already holding this (normalized) email or phone, if any. Emails match
+    case-insensitively, as find_duplicate_groups groups them (client_email_lower index).
+    """
+    if field not in IDENTITY_FIELDS or not value:
+        return None
+    if field == 'email':
+        queryset = Client.objects.alias(email_key=Lower('email')).filter(email_key=value.lower())
+    else:
+        queryset = Client.objects.filter(phone=value)
+    if exclude:
+        queryset = queryset.exclude(pk=exclude)
+    return queryset.order_by(*SURVIVOR_ORDER).first()
+
+
+def find_duplicate_groups():
+    """
+    Return {survivor_id: [duplicate_id, ...]} for every set of clients linked by a shared email
+    (case-insensitive) or phone, chains included (A~B by email, B~C by phone), from one windowed
+    query. Clients are never grouped with a different email or phone than their own.
+    """
+    rows = (
+        Client.objects.annotate(
+            email_key=Lower('email'),
+            email_count=Window(Count('id'), partition_by=Lower('email')),
+            phone_count=Window(Count('id'), partition_by=F('phone')),
+        )
+        .filter((Q(email_count__gt=1) & ~Q(email='')) | (Q(phone_count__gt=1) & ~Q(phone='')))
+        .values_list('id', 'email_key', 'phone', 'current_stage', 'active_assignee_id', 'created_at')
+        .order_by('created_at', 'id')
+    )
+
+    # Union-find over clients and the identity values they share. Clients whose emails or phones
+    # differ stay apart even when linked through the other field: likely different people.
+    parent, values = {}, {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a == b:
+            return
+        merged = {field: values[a][field] | values[b][field] for field in IDENTITY_FIELDS}
+        if all(len(v) <= 1 for v in merged.values()):
+            parent[a], values[b] = b, merged
+
+    ranks = {}
+    for pk, email, phone, stage, assignee_id, created_at in rows:
+        ranks[pk] = survivor_rank(stage, assignee_id, created_at, pk)
+        identity = {'email': email, 'phone': phone}
+        values[pk] = {field: {value} - {''} for field, value in identity.items()}
+        for field, value in identity.items():
+            if value:
+                values.setdefault((field, value), {'email': set(), 'phone': set(), field: {value}})
+                union(pk, (field, value))
+
+    members = {}
+    for pk in ranks:
+        members.setdefault(find(pk), []).append(pk)
+    groups = {}
+    for ids in members.values():
+        if len(ids) > 1:
+            survivor, *duplicates = sorted(ids, key=ranks.__getitem__)
+            groups[survivor] = duplicates
+    return groups
+
+
+def merge_clients(groups):
+    """
+    Fold duplicate clients into their survivors and delete them.
+
+    Stage history, assignments, chat messages, sessions and archives are moved with one UPDATE
+    per table for all groups. A survivor keeps its own stage; blank name/email/phone and an empty
+    context are filled from its duplicates (oldest first), an unassigned survivor takes over the
+    latest assigned duplicate's assignment, and a survivor without a summary job takes the latest one.
+
+    Args:
+        groups: {survivor_id: [duplicate_id, ...]}
+
+    Returns:
+        int: Number of clients removed
+    """
+    survivor_of = {dup: survivor for survivor, dups in groups.items() for dup in dups if dup != survivor}
+    if not survivor_of:
+        return 0
+    duplicate_ids = list(survivor_of)
+
+    def repoint():
+        return Case(*[When(client_id=dup, then=Value(survivor)) for dup, survivor in survivor_of.items()],
+                    output_field=models.BigIntegerField())
+
+    now = timezone.now()
+    with transaction.atomic():
+        clients = {c.pk: c for c in Client.objects.select_for_update().filter(pk__in=[*groups, *duplicate_ids]).order_by('pk')}
+        assignments = ClientAssignment.objects.filter(client_id__in=duplicate_ids, is_active=True, assigned_to__isnull=False)  # type: ignore
+        latest_assignment = {a.client_id: a for a in assignments.order_by('created_at')}
+        jobs = SummaryJob.objects.filter(client_id__in=[*groups, *duplicate_ids]).order_by('updated_at')  # type: ignore
+        latest_job = {j.client_id: j for j in jobs}
+
+        survivors, kept_assignments, job_moves = [], {}, {}
+        for survivor_id, dups in groups.items():
+            survivor = clients.get(survivor_id)
+            dups = sorted((clients[d] for d in dups if d in clients and d != survivor_id), key=lambda c: (c.created_at, c.pk))
+            if survivor is None or not dups:
+                continue
+            for dup in dups:
+                for field in ('name', *IDENTITY_FIELDS):
+                    if not getattr(survivor, field):
+                        setattr(survivor, field, getattr(dup, field))
+                if not survivor.context and dup.context:
+                    survivor.context, survivor.context_last_message_id = dup.context, dup.context_last_message_id
+            if survivor.active_assignee_id is None:
+                taken = [latest_assignment[d.pk] for d in dups if d.pk in latest_assignment]
+                if taken:
+                    assignment = max(taken, key=lambda a: a.created_at)
+                    kept_assignments[survivor_id] = assignment.pk
+                    survivor.active_assignee_id = assignment.assigned_to_id
+            if survivor_id not in latest_job:
+                dup_jobs = [latest_job[d.pk] for d in dups if d.pk in latest_job]
+                if dup_jobs:
+                    job_moves[max(dup_jobs, key=lambda j: j.updated_at).pk] = survivor_id
+            survivor.search_text = build_search_text(survivor.name, survivor.email, survivor.phone)
+            survivor.updated_at = now
+            survivors.append(survivor)
+
+        # Exactly one active assignment per survivor afterwards (unique_active_assignment)
+        ClientAssignment.objects.filter(  # type: ignore
+            Q(client_id__in=duplicate_ids) | Q(client_id__in=list(kept_assignments)), is_active=True
+        ).exclude(pk__in=list(kept_assignments.values())).update(is_active=False, updated_at=now)
+        ClientAssignment.objects.filter(client_id__in=duplicate_ids).update(client_id=repoint())  # type: ignore
+        ClientStageHistory.objects.filter(client_id__in=duplicate_ids).update(client_id=repoint())  # type: ignore
+        ChatHistory.objects.filter(client_id__in=duplicate_ids).update(client_id=repoint())
+        ChatArchive.objects.filter(client_id__in=duplicate_ids).update(client_id=repoint())
+        sessions = list(ChatSession.objects.filter(client_id__in=duplicate_ids).values_list('session_id', flat=True))
+        ChatSession.objects.filter(client_id__in=duplicate_ids).update(client_id=repoint())
+        if job_moves:
+            SummaryJob.objects.filter(pk__in=list(job_moves)).update(  # type: ignore
+                client_id=Case(*[When(pk=pk, then=Value(s)) for pk, s in job_moves.items()], output_field=models.BigIntegerField())
+            )
+
+        StageCount.shift(
+            change for survivor in survivors if survivor.pk in kept_assignments
+            for change in [(survivor.current_stage, None, -1), (survivor.current_stage, survivor.active_assignee_id, 1)]
+        )
+        Client.objects.bulk_update(survivors, [
+            'name', 'email', 'phone', 'search_text', 'context', 'context_last_message_id', 'active_assignee', 'updated_at'
+        ])
+        # Remaining summary jobs cascade; post_delete takes the duplicates off StageCount
+        Client.objects.filter(pk__in=duplicate_ids).delete()
+
+    # Only reaches other processes with a shared cache backend. Where it doesn't, a worker still
+    # holding a merged-away id re-reads the session when the insert fails (chat.buffer.save_message).
+    cache.delete_many([ChatSession.CACHE_KEY.format(s) for s in sessions])
+    invalidate_detail(*groups, *duplicate_ids)
+    return len(duplicate_ids)
@@ -0,0 +1,64 @@
+"""
+Offline stand-in for the OpenAI chat completions API.
+
+Enabled with LLM_BACKEND=fake. Returns a deterministic context built from
+keywords in the prompt, so summarization can be exercised without network
+access or API keys. LLM_FAKE_LATENCY_MS simulates model latency.
+"""
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+INTENT_KEYWORDS = [
+    ('refinanc', 'refinance'),
+    ('purchase', 'new mortgage'),
+    ('buy', 'new mortgage'),
+    ('heloc', 'home equity'),
+]
+
+
+def _latency():
+    return int(os.environ.get('LLM_FAKE_LATENCY_MS', '0')) / 1000
+
+
+def _completion(messages):
+    prompt = messages[-1]['content']
+    text = prompt.lower()
+    intent = next((label for keyword, label in INTENT_KEYWORDS if keyword in text), 'loan inquiry')
+    context = {
+        'intent': intent,
+        'loan_details': {},
+        'financial_info': {},
+        'preferences': [],
+        'sentiment': 'neutral',
+        'urgency': 'high' if 'urgent' in text or 'asap' in text else 'medium',
+        'summary': f'Client is interested in {intent}.',
+    }
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(context)))],
+        usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=60, total_tokens=len(prompt) // 4 + 60),
+    )
+
+
+class _Completions:
+    def create(self, messages, **kwargs):
+        time.sleep(_latency())
+        return _completion(messages)
+
+
+class _AsyncCompletions:
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(_latency())
+        return _completion(messages)
+
+
+class FakeOpenAI:
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=_Completions())
+
+
+class FakeAsyncOpenAI:
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=_AsyncCompletions())
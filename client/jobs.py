@@ -0,0 +1,119 @@
+import logging
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+from chat.models import ChatHistory
+from .models import SummaryJob
+from .services import CircuitOpen, llm_breaker, summarize_chat_history
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+LEASE_SECONDS = 10 * 60
+# What a worker writes back; session_id and dirty belong to enqueue_summary, which may run meanwhile
+RESULT_FIELDS = ['status', 'attempts', 'run_after', 'last_error', 'updated_at']
+
+
+def enqueue_summary(client, session_id):
+    """
+    Queue (or re-queue) the chat summary for a client. One job row per client keeps this idempotent.
+
+    A done job is queued again. A pending one keeps its attempts and backoff, a failed one stays
+    failed (MAX_ATTEMPTS used up; retry from the admin), and a running one is marked dirty for its
+    worker to queue again when it finishes, so no two workers summarize the same client at once.
+    """
+    now = timezone.now()
+    done = Q(status='done')
+    updated = SummaryJob.objects.filter(client=client).update(  # type: ignore
+        session_id=session_id,
+        status=Case(When(done, then=Value('pending')), default=F('status')),
+        attempts=Case(When(done, then=Value(0)), default=F('attempts'), output_field=PositiveIntegerField()),
+        run_after=Case(When(done, then=Value(now)), default=F('run_after')),
+        dirty=Case(When(status='running', then=Value(True)), default=F('dirty')),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            SummaryJob.objects.create(client=client, session_id=session_id, run_after=now)  # type: ignore
+    except IntegrityError:
+        enqueue_summary(client, session_id)  # created by a concurrent request
+
+
+def claim_jobs(limit=10):
+    """
+    Mark up to `limit` due jobs as running and return them.
+
+    Jobs left running by a crashed worker are reclaimed once their lease expires.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            SummaryJob.objects.select_for_update(skip_locked=True)  # type: ignore
+            .filter(Q(status='pending', run_after__lte=now) | Q(status='running', updated_at__lt=now - timedelta(seconds=LEASE_SECONDS)))
+            .order_by('run_after').values_list('id', flat=True)[:limit]
+        )
+        SummaryJob.objects.filter(id__in=ids).update(status='running', attempts=F('attempts') + 1, dirty=False, updated_at=now)  # type: ignore
+    return list(SummaryJob.objects.filter(id__in=ids).select_related('client'))  # type: ignore
+
+
+def unsummarized_messages(client, session_id):
+    """Chat messages the client's current context hasn't seen yet."""
+    return (
+        ChatHistory.objects.filter(session_id=session_id, data_type='message', id__gt=client.context_last_message_id or 0)
+        .order_by('id').values('id', 'sender_type', 'message')
+    )
+
+
+def run_job(job):
+    client = job.client
+    try:
+        messages = list(unsummarized_messages(client, job.session_id))
+        context = summarize_chat_history(messages, previous_context=client.context, fail_silently=False)
+        # Together, so a failed stage/assignment write leaves the context to be redone on retry
+        with transaction.atomic():
+            if messages:
+                client.update_context(context, messages[-1]['id'])
+            client.initialize()
+    except CircuitOpen as e:
+        # Not this job's fault: hand back the attempt and wait for the breaker to close
+        job.status = 'pending'
+        job.attempts -= 1
+        job.run_after = timezone.now() + timedelta(seconds=max(e.retry_after, BACKOFF_SECONDS))
+        job.save(update_fields=RESULT_FIELDS)
+        return False
+    except Exception as e:
+        job.last_error = str(e)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+            logger.error('Summary job for client %s failed after %s attempts: %s', job.client_id, job.attempts, e)
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+            logger.warning('Summary job for client %s failed (attempt %s), retrying at %s', job.client_id, job.attempts, job.run_after)
+        job.save(update_fields=RESULT_FIELDS)
+        return False
+
+    now = timezone.now()
+    # Re-enqueued mid-run: messages this run may not have seen, so go again (a fresh start)
+    if not SummaryJob.objects.filter(pk=job.pk, dirty=False).update(status='done', last_error='', updated_at=now):  # type: ignore
+        SummaryJob.objects.filter(pk=job.pk).update(  # type: ignore
+            status='pending', attempts=0, dirty=False, run_after=now, last_error='', updated_at=now
+        )
+    return True
+
+
+def run_pending(limit=10):
+    """Process one batch of due jobs. Returns the number of jobs claimed."""
+    if llm_breaker.retry_after():
+        return 0  # leave jobs unclaimed while the model service is failing
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        try:
+            run_job(job)
+        except Exception:
+            # Couldn't even record the outcome (database gone?); the lease hands the job back later
+            logger.exception('Summary job for client %s could not be processed', job.client_id)
+    return len(jobs)
@@ -0,0 +1,49 @@
+import csv
+import json
+import sys
+from django.core.management.base import BaseCommand
+from client.models import Client
+
+FIELDS = ['id', 'name', 'email', 'phone', 'stage', 'assigned_to', 'context', 'created_at']
+
+
+class Command(BaseCommand):
+    help = 'Stream clients to a CSV or JSONL file with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--stage', choices=dict(Client.STAGE_CHOICES).keys())
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        clients = Client.objects.with_active_assignee().order_by('id')
+        if options['stage']:
+            clients = clients.filter(current_stage=options['stage'])
+        rows = clients.values('id', 'name', 'email', 'phone', 'current_stage', 'assigned_to_email', 'context', 'created_at')
+
+        out = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            writer = csv.DictWriter(out, fieldnames=FIELDS) if fmt == 'csv' else None
+            if writer:
+                writer.writeheader()
+            count = 0
+            for r in rows.iterator(chunk_size=options['chunk_size']):
+                row = {
+                    'id': r['id'], 'name': r['name'], 'email': r['email'], 'phone': r['phone'], 'stage': r['current_stage'],
+                    'assigned_to': r['assigned_to_email'], 'context': r['context'], 'created_at': r['created_at'].isoformat()
+                }
+                if writer:
+                    writer.writerow({**row, 'context': json.dumps(row['context'])})
+                else:
+                    out.write(json.dumps(row) + '\n')
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if out is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(f'Exported {count} client(s) to {path}'))
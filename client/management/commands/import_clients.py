@@ -0,0 +1,93 @@
+import csv
+import json
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from client.models import Client, ClientAssignment, ClientStageHistory, StageCount, StageTransitionDaily
+from client.search import build_search_text, normalize_phone
+
+STAGES = dict(Client.STAGE_CHOICES)
+
+
+def read_rows(path, fmt):
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def normalize(row, default_stage):
+    context = row.get('context') or {}
+    if isinstance(context, str):
+        context = json.loads(context)
+    return {
+        'name': (row.get('name') or '').strip().title(),
+        'email': (row.get('email') or '').strip().lower(),
+        'phone': normalize_phone(row.get('phone')),
+        'current_stage': row.get('stage') if row.get('stage') in STAGES else default_stage,
+        'context': context,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Bulk import clients from a CSV or JSONL file, skipping emails and phones that already exist'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--stage', default='lead', choices=STAGES.keys(), help='Stage for rows without a valid stage')
+        parser.add_argument('--remarks', default='Imported from file.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        self.seen_emails, self.seen_phones = set(), set()
+        created = skipped = 0
+
+        rows = read_rows(path, fmt)
+        try:
+            while batch := list(islice(rows, options['batch_size'])):
+                clients = self.dedupe([normalize(row, options['stage']) for row in batch])
+                skipped += len(batch) - len(clients)
+                self.create_batch(clients, options['remarks'])
+                created += len(clients)
+                self.stdout.write(f'Imported {created} client(s), skipped {skipped}')
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Failed to read {path}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {created} imported, {skipped} skipped'))
+
+    def dedupe(self, rows):
+        """Drop rows without contact details, or whose email/phone is already in the file or the database."""
+        rows = [r for r in rows if r['email'] or r['phone']]
+        emails = {r['email'] for r in rows if r['email']}
+        phones = {r['phone'] for r in rows if r['phone']}
+        for email, phone in Client.objects.filter(Q(email__in=emails) | Q(phone__in=phones)).values_list('email', 'phone'):
+            self.seen_emails.add(email)
+            self.seen_phones.add(phone)
+
+        unique = []
+        for r in rows:
+            if (r['email'] and r['email'] in self.seen_emails) or (r['phone'] and r['phone'] in self.seen_phones):
+                continue
+            self.seen_emails.add(r['email'])
+            self.seen_phones.add(r['phone'])
+            unique.append(Client(**r, search_text=build_search_text(r['name'], r['email'], r['phone'])))
+        return unique
+
+    @transaction.atomic
+    def create_batch(self, clients, remarks):
+        clients = Client.objects.bulk_create(clients)
+        history = ClientStageHistory.objects.bulk_create(  # type: ignore
+            ClientStageHistory(client=c, from_stage=None, to_stage=c.current_stage, remarks=remarks) for c in clients
+        )
+        StageTransitionDaily.record((h.created_at, None, None, h.to_stage, 0) for h in history)
+        StageCount.shift((c.current_stage, None, 1) for c in clients)
+        ClientAssignment.objects.bulk_create(  # type: ignore
+            ClientAssignment(client=c, assigned_to=None, is_active=True, remarks='Awaiting assignment') for c in clients
+        )
@@ -0,0 +1,26 @@
+from itertools import islice
+from django.core.management.base import BaseCommand
+from client.dedup import find_duplicate_groups, merge_clients
+
+
+class Command(BaseCommand):
+    help = 'Merge clients sharing an email or phone into the most worked (then oldest) of them, moving their history, assignments and chats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the duplicate groups without merging them')
+        parser.add_argument('--batch-size', type=int, default=200, help='Groups merged per transaction')
+
+    def handle(self, *args, **options):
+        groups = find_duplicate_groups()
+        duplicates = sum(len(dups) for dups in groups.values())
+        if options['dry_run']:
+            for survivor, dups in groups.items():
+                self.stdout.write(f'{survivor} <- {", ".join(map(str, dups))}')
+            self.stdout.write(self.style.SUCCESS(f'{duplicates} duplicate(s) of {len(groups)} client(s) found'))
+            return
+
+        items = iter(groups.items())
+        merged = 0
+        while batch := dict(islice(items, options['batch_size'])):
+            merged += merge_clients(batch)
+        self.stdout.write(self.style.SUCCESS(f'Merged {merged} duplicate(s) into {len(groups)} client(s)'))
@@ -0,0 +1,36 @@
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import OuterRef, Subquery
+from client.analytics import rebuild_stage_counts
+from client.models import Client, ClientAssignment
+
+
+class Command(BaseCommand):
+    help = 'Verify, and unless --verify is given repair, Client.active_assignee against the active ClientAssignment rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Report mismatches without fixing them; exits non-zero if any')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        active = ClientAssignment.objects.filter(client=OuterRef('pk'), is_active=True).values('assigned_to_id')[:1]  # type: ignore
+        rows = (
+            Client.objects.annotate(expected=Subquery(active)).order_by('id')
+            .values_list('id', 'active_assignee_id', 'expected').iterator(chunk_size=options['batch_size'])
+        )
+        mismatched = fixed = 0
+        while batch := list(islice(rows, options['batch_size'])):
+            stale = [Client(id=pk, active_assignee_id=expected) for pk, current, expected in batch if current != expected]
+            mismatched += len(stale)
+            if stale and not options['verify']:
+                fixed += Client.objects.bulk_update(stale, ['active_assignee'])
+
+        if fixed:
+            rebuild_stage_counts()  # counted per assignee
+
+        if options['verify']:
+            if mismatched:
+                raise CommandError(f'{mismatched} client(s) have a stale active_assignee')
+            self.stdout.write(self.style.SUCCESS('active_assignee is consistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {fixed} of {mismatched} mismatched client(s)'))
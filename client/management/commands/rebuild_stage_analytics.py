@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from client.analytics import rebuild_stage_analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily stage-transition aggregates from ClientStageHistory and the per-stage client counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        replayed = rebuild_stage_analytics(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stage analytics from {replayed} transition(s)'))
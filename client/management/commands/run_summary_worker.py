@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from client.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Process queued chat summary jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Process due jobs until the queue is empty, then exit')
+
+    def handle(self, *args, **options):
+        while True:
+            claimed = run_pending(options['batch_size'])
+            if claimed:
+                self.stdout.write(f'Processed {claimed} job(s)')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0007_remove_custom_permissions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['-created_at', '-id'], name='client_clie_created_39b2f3_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0008_client_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session_id', models.UUIDField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary_job', to='client.client')),
+            ],
+            options={
+                'ordering': ['run_after'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='client_summ_status_1e86ca_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0009_summaryjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='context_last_message_id',
+            field=models.BigIntegerField(blank=True, help_text='Last chat message included in context', null=True),
+        ),
+    ]
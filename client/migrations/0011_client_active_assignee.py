@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_active_assignee(apps, schema_editor):
+    Client = apps.get_model('client', 'Client')
+    ClientAssignment = apps.get_model('client', 'ClientAssignment')
+    active = ClientAssignment.objects.filter(client=models.OuterRef('pk'), is_active=True).values('assigned_to_id')[:1]
+    Client.objects.update(active_assignee=models.Subquery(active))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('client', '0010_client_context_last_message_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='active_assignee',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Denormalized from the active ClientAssignment; maintained by assign()', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='active_clients', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['active_assignee', '-created_at'], name='client_clie_active__2ab638_idx'),
+        ),
+        migrations.RunPython(backfill_active_assignee, migrations.RunPython.noop),
+    ]
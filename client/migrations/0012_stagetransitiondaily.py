@@ -0,0 +1,49 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('client', '0011_client_active_assignee'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageTransitionDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('from_stage', models.CharField(blank=True, max_length=50)),
+                ('to_stage', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.BigIntegerField(default=0, help_text='Seconds spent in from_stage, summed')),
+                ('under_1h', models.PositiveIntegerField(default=0)),
+                ('under_4h', models.PositiveIntegerField(default=0)),
+                ('under_1d', models.PositiveIntegerField(default=0)),
+                ('under_3d', models.PositiveIntegerField(default=0)),
+                ('under_7d', models.PositiveIntegerField(default=0)),
+                ('under_14d', models.PositiveIntegerField(default=0)),
+                ('under_30d', models.PositiveIntegerField(default=0)),
+                ('under_90d', models.PositiveIntegerField(default=0)),
+                ('over_90d', models.PositiveIntegerField(default=0)),
+                ('csm', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'csm'], name='client_stag_date_63c68a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stagetransitiondaily',
+            constraint=models.UniqueConstraint(condition=models.Q(('csm__isnull', False)), fields=('date', 'csm', 'from_stage', 'to_stage'), name='unique_daily_transition'),
+        ),
+        migrations.AddConstraint(
+            model_name='stagetransitiondaily',
+            constraint=models.UniqueConstraint(condition=models.Q(('csm__isnull', True)), fields=('date', 'from_stage', 'to_stage'), name='unique_daily_unassigned_transition'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:33
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copies of client.search as of this migration, so later changes there don't alter history.
+# client.signals.reinstall_search_index brings the index up to date after every migrate.
+
+POSTGRES_CREATE = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS client_search_trgm ON client_client USING gin (search_text gin_trgm_ops)',
+]
+POSTGRES_DROP = ['DROP INDEX IF EXISTS client_search_trgm']
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS client_search USING fts5("
+    "search_text, content='client_client', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS client_search_ai AFTER INSERT ON client_client BEGIN "
+    "INSERT INTO client_search(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS client_search_ad AFTER DELETE ON client_client BEGIN "
+    "INSERT INTO client_search(client_search, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS client_search_au AFTER UPDATE OF search_text ON client_client BEGIN "
+    "INSERT INTO client_search(client_search, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+    "INSERT INTO client_search(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "INSERT INTO client_search(client_search) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS client_search_ai',
+    'DROP TRIGGER IF EXISTS client_search_ad',
+    'DROP TRIGGER IF EXISTS client_search_au',
+    'DROP TABLE IF EXISTS client_search',
+]
+
+
+def build_search_text(name, email, phone):
+    return ' '.join(filter(None, [(name or '').lower(), (email or '').lower(), re.sub(r'\D', '', phone or '')]))
+
+
+def backfill_search_text(apps, schema_editor):
+    Client = apps.get_model('client', 'Client')
+    batch = []
+    for client in Client.objects.only('id', 'name', 'email', 'phone').iterator(chunk_size=2000):
+        client.search_text = build_search_text(client.name, client.email, client.phone)
+        batch.append(client)
+        if len(batch) >= 2000:
+            Client.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    Client.objects.bulk_update(batch, ['search_text'])
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0012_stagetransitiondaily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE}),
+            run({'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# Frozen copies of client.search as of this migration, so later changes there don't alter history.
+# client.signals.reinstall_search_index brings the indexes up to date after every migrate.
+
+KEYS = ('intent', 'urgency', 'sentiment')
+
+# Every scalar in the context document, nested values included; keys are left out
+CONTEXT_VALUES = "(SELECT group_concat(value, ' ') FROM json_tree({}) WHERE type IN ('text', 'integer', 'real'))"
+
+POSTGRES_CREATE = [
+    "CREATE INDEX IF NOT EXISTS client_context_fts ON client_client "
+    "USING gin (jsonb_to_tsvector('english', context, '[\"string\", \"numeric\"]'))",
+    *(f"CREATE INDEX IF NOT EXISTS client_context_{key} ON client_client ((LOWER(\"context\" ->> '{key}')))" for key in KEYS),
+]
+POSTGRES_DROP = [
+    *(f'DROP INDEX IF EXISTS client_context_{key}' for key in KEYS),
+    'DROP INDEX IF EXISTS client_context_fts',
+]
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS client_context_search USING fts5(context, tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS client_context_search_ai AFTER INSERT ON client_client BEGIN "
+    f"INSERT INTO client_context_search(rowid, context) VALUES (new.id, {CONTEXT_VALUES.format('new.context')}); END",
+    "CREATE TRIGGER IF NOT EXISTS client_context_search_ad AFTER DELETE ON client_client BEGIN "
+    "DELETE FROM client_context_search WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS client_context_search_au AFTER UPDATE OF context ON client_client BEGIN "
+    "DELETE FROM client_context_search WHERE rowid = old.id; "
+    f"INSERT INTO client_context_search(rowid, context) VALUES (new.id, {CONTEXT_VALUES.format('new.context')}); END",
+    'DELETE FROM client_context_search',
+    f"INSERT INTO client_context_search(rowid, context) SELECT id, {CONTEXT_VALUES.format('context')} FROM client_client",
+    *(f"CREATE INDEX IF NOT EXISTS client_context_{key} ON client_client ((LOWER(JSON_EXTRACT(\"context\", '$.{key}'))))" for key in KEYS),
+]
+SQLITE_DROP = [
+    *(f'DROP INDEX IF EXISTS client_context_{key}' for key in KEYS),
+    'DROP TRIGGER IF EXISTS client_context_search_ai',
+    'DROP TRIGGER IF EXISTS client_context_search_ad',
+    'DROP TRIGGER IF EXISTS client_context_search_au',
+    'DROP TABLE IF EXISTS client_context_search',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0013_client_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE}),
+            run({'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_counts(apps, schema_editor):
+    Client = apps.get_model('client', 'Client')
+    StageCount = apps.get_model('client', 'StageCount')
+    StageCount.objects.bulk_create([
+        StageCount(stage=r['current_stage'], csm_id=r['active_assignee_id'], count=r['n'])
+        for r in Client.objects.values('current_stage', 'active_assignee_id').annotate(n=models.Count('id')).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('client', '0014_client_context_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('csm', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stagecount',
+            constraint=models.UniqueConstraint(condition=models.Q(('csm__isnull', False)), fields=('stage', 'csm'), name='unique_stage_count'),
+        ),
+        migrations.AddConstraint(
+            model_name='stagecount',
+            constraint=models.UniqueConstraint(condition=models.Q(('csm__isnull', True)), fields=('stage',), name='unique_unassigned_stage_count'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0015_stagecount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summaryjob',
+            name='dirty',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:28
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0016_summaryjob_dirty'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='client_email_lower'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Lower, Trim
+
+
+def lowercase_emails(apps, schema_editor):
+    # Client.save lowercases from now on; bring rows saved with mixed-case emails in line
+    Client = apps.get_model('client', 'Client')
+    Client.objects.exclude(email=Lower(Trim('email'))).update(email=Lower(Trim(F('email'))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0017_client_email_lower'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
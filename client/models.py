@@ -1,5 +1,70 @@
-from django.db import models
+import re
+from bisect import bisect_left
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
 from account.models import BaseModel, User
+from .cache import invalidate_detail
+from .search import build_search_text
+
+
+class ClientQuerySet(models.QuerySet):
+    def with_active_assignee(self):
+        # Reads the denormalized active_assignee column; no ClientAssignment join needed
+        return self.annotate(assigned_to_email=models.F('active_assignee__email'))
+
+    def search(self, term):
+        # Emails are stored lowercased and phones as digits, so prefix matches can use their indexes
+        term = term.strip()
+        if not term:
+            return self
+        if '@' in term:
+            return self.filter(email__startswith=term.lower())
+        digits = re.sub(r'\D', '', term)
+        if len(digits) >= 3 and not re.search(r'[a-zA-Z]', term):
+            return self.filter(phone__startswith=digits)
+        return self.filter(models.Q(name__icontains=term) | models.Q(email__startswith=term.lower()))
+
+    def set_stage(self, new_stage, changed_by=None, remarks=''):
+        """Bulk Client.set_stage: one history insert and one UPDATE. Returns the number of clients moved."""
+        entered_at = ClientStageHistory.objects.filter(client=models.OuterRef('pk')).values('created_at')[:1]  # type: ignore
+        with transaction.atomic():
+            clients = list(
+                self.exclude(current_stage=new_stage).select_for_update()
+                .annotate(entered_at=models.Subquery(entered_at))
+                .values_list('id', 'current_stage', 'active_assignee_id', 'entered_at', 'created_at')
+            )
+            history = ClientStageHistory.objects.bulk_create([  # type: ignore
+                ClientStageHistory(client_id=pk, from_stage=stage, to_stage=new_stage, changed_by=changed_by, remarks=remarks)
+                for pk, stage, *_ in clients
+            ])
+            Client.objects.filter(id__in=[pk for pk, *_ in clients]).update(current_stage=new_stage, updated_at=timezone.now())
+            invalidate_detail(*[pk for pk, *_ in clients])
+            StageTransitionDaily.record([
+                (h.created_at, csm_id, stage, new_stage, (h.created_at - (entered or created)).total_seconds())
+                for h, (pk, stage, csm_id, entered, created) in zip(history, clients)
+            ])
+            StageCount.shift(
+                change for pk, stage, csm_id, *_ in clients for change in [(stage, csm_id, -1), (new_stage, csm_id, 1)]
+            )
+        return len(clients)
+
+    def assign(self, assigned_to=None, assigned_by=None, remarks=''):
+        """Bulk Client.assign: deactivate then insert, so unique_active_assignment holds. Returns the number of clients assigned."""
+        with transaction.atomic():
+            clients = list(self.select_for_update().values_list('id', 'current_stage', 'active_assignee_id'))
+            ids = [pk for pk, *_ in clients]
+            ClientAssignment.objects.filter(client_id__in=ids, is_active=True).update(is_active=False, updated_at=timezone.now())  # type: ignore
+            ClientAssignment.objects.bulk_create([  # type: ignore
+                ClientAssignment(client_id=pk, assigned_to=assigned_to, assigned_by=assigned_by, is_active=True, remarks=remarks)
+                for pk in ids
+            ])
+            Client.objects.filter(id__in=ids).update(active_assignee=assigned_to, updated_at=timezone.now())
+            StageCount.shift(
+                change for pk, stage, csm_id in clients for change in [(stage, csm_id, -1), (stage, assigned_to and assigned_to.pk, 1)]
+            )
+            invalidate_detail(*ids)
+        return len(ids)
 
 
 class Client(BaseModel):
@@ -24,34 +89,77 @@ class Client(BaseModel):
     email = models.EmailField(db_index=True, blank=True)
     phone = models.CharField(max_length=20, db_index=True, blank=True)
     context = models.JSONField(default=dict, blank=True)
+    context_last_message_id = models.BigIntegerField(null=True, blank=True, help_text='Last chat message included in context')
     current_stage = models.CharField(max_length=50, choices=STAGE_CHOICES, default='lead', db_index=True)
+    # Lowercased name, email and phone digits; indexed by client/search.py (trigram GIN or FTS5)
+    search_text = models.TextField(blank=True, default='', editable=False)
+    active_assignee = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='active_clients',
+        help_text='Denormalized from the active ClientAssignment; maintained by assign()'
+    )
+
+    objects = ClientQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['email', 'phone']),
             models.Index(fields=['current_stage', '-created_at']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['active_assignee', '-created_at']),
+            models.Index(Lower('email'), name='client_email_lower'),  # dedup.find_existing
         ]
 
     def __str__(self):
         return f"{self.name} - {self.current_stage}"
 
+    def save(self, *args, **kwargs):
+        # Lowercased so exact and prefix lookups (search, dedup) can use the email index
+        self.email = (self.email or '').strip().lower()
+        self.search_text = build_search_text(self.name, self.email, self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'email', 'phone'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'search_text'}
+        super().save(*args, **kwargs)
+        invalidate_detail(self.pk)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_detail(pk)
+        return result
+
     @property
     def is_complete(self):
         return all([self.name, self.email, self.phone])
 
     def set_stage(self, new_stage, changed_by=None, remarks=''):
         if new_stage != self.current_stage:
-            ClientStageHistory.objects.create(  # type: ignore
-                client=self, from_stage=self.current_stage, to_stage=new_stage, 
-                changed_by=changed_by, remarks=remarks
-            )
-            self.current_stage = new_stage
-            self.save()
+            with transaction.atomic():
+                entered_at = self.stage_history.values_list('created_at', flat=True).first() or self.created_at  # type: ignore
+                history = ClientStageHistory.objects.create(  # type: ignore
+                    client=self, from_stage=self.current_stage, to_stage=new_stage, 
+                    changed_by=changed_by, remarks=remarks
+                )
+                StageTransitionDaily.record([
+                    (history.created_at, self.active_assignee_id, self.current_stage, new_stage, (history.created_at - entered_at).total_seconds())  # type: ignore
+                ])
+                StageCount.shift([(self.current_stage, self.active_assignee_id, -1), (new_stage, self.active_assignee_id, 1)])  # type: ignore
+                self.current_stage = new_stage
+                self.save()
 
     def assign(self, assigned_to=None, assigned_by=None, remarks=''):
-        ClientAssignment.objects.filter(client=self, is_active=True).update(is_active=False)  # type: ignore
-        ClientAssignment.objects.create(client=self, assigned_to=assigned_to, assigned_by=assigned_by, is_active=True, remarks=remarks)  # type: ignore
+        with transaction.atomic():
+            ClientAssignment.objects.filter(client=self, is_active=True).update(is_active=False)  # type: ignore
+            ClientAssignment.objects.create(client=self, assigned_to=assigned_to, assigned_by=assigned_by, is_active=True, remarks=remarks)  # type: ignore
+            StageCount.shift([(self.current_stage, self.active_assignee_id, -1), (self.current_stage, assigned_to and assigned_to.pk, 1)])  # type: ignore
+            self.active_assignee = assigned_to
+            self.save(update_fields=['active_assignee', 'updated_at'])
+
+    def update_context(self, context, last_message_id):
+        self.context = context
+        self.context_last_message_id = last_message_id
+        self.save(update_fields=['context', 'context_last_message_id', 'updated_at'])
 
     def initialize(self, context=None, remarks='Client information collected via chat.'):
         if self.stage_history.exists():  # type: ignore
@@ -98,3 +206,151 @@ class ClientAssignment(BaseModel):
     def __str__(self):
         name = self.assigned_to.get_full_name() if self.assigned_to else "Unassigned"  # type: ignore
         return f"{self.client.name} → {name}"
+
+
+class SummaryJob(BaseModel):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, related_name='summary_job')
+    session_id = models.UUIDField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Re-enqueued while running: the worker queues it again once the current run finishes
+    dirty = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['run_after']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.client_id} - {self.status}"  # type: ignore
+
+
+class StageTransitionDaily(models.Model):
+    """
+    Daily stage-transition counts and time spent in the stage being left, per CSM.
+    Maintained incrementally by set_stage; rebuild with `manage.py rebuild_stage_analytics`.
+    """
+    # Upper bound (seconds) of each time-in-stage bucket field; anything longer lands in over_90d
+    DURATION_BUCKETS = [
+        ('under_1h', 60 * 60),
+        ('under_4h', 4 * 60 * 60),
+        ('under_1d', 24 * 60 * 60),
+        ('under_3d', 3 * 24 * 60 * 60),
+        ('under_7d', 7 * 24 * 60 * 60),
+        ('under_14d', 14 * 24 * 60 * 60),
+        ('under_30d', 30 * 24 * 60 * 60),
+        ('under_90d', 90 * 24 * 60 * 60),
+        ('over_90d', None),
+    ]
+
+    date = models.DateField()
+    csm = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    from_stage = models.CharField(max_length=50, blank=True)
+    to_stage = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+    total_duration = models.BigIntegerField(default=0, help_text='Seconds spent in from_stage, summed')
+    under_1h = models.PositiveIntegerField(default=0)
+    under_4h = models.PositiveIntegerField(default=0)
+    under_1d = models.PositiveIntegerField(default=0)
+    under_3d = models.PositiveIntegerField(default=0)
+    under_7d = models.PositiveIntegerField(default=0)
+    under_14d = models.PositiveIntegerField(default=0)
+    under_30d = models.PositiveIntegerField(default=0)
+    under_90d = models.PositiveIntegerField(default=0)
+    over_90d = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [models.Index(fields=['date', 'csm'])]
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'csm', 'from_stage', 'to_stage'], condition=models.Q(csm__isnull=False), name='unique_daily_transition'),
+            models.UniqueConstraint(fields=['date', 'from_stage', 'to_stage'], condition=models.Q(csm__isnull=True), name='unique_daily_unassigned_transition'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.from_stage or ''} → {self.to_stage} ({self.count})"
+
+    @classmethod
+    def bucket_for(cls, seconds):
+        bounds = [bound for _, bound in cls.DURATION_BUCKETS[:-1]]
+        return cls.DURATION_BUCKETS[bisect_left(bounds, seconds)][0]
+
+    @classmethod
+    def record(cls, transitions):
+        """
+        Fold transitions into the daily rows with one UPDATE (or INSERT) per group.
+
+        Args:
+            transitions: Iterable of (at, csm_id, from_stage, to_stage, seconds_in_from_stage)
+        """
+        groups = {}
+        for at, csm_id, from_stage, to_stage, seconds in transitions:
+            key = (timezone.localdate(at), csm_id, from_stage or '', to_stage)
+            group = groups.setdefault(key, {'count': 0, 'total_duration': 0})
+            group['count'] += 1
+            group['total_duration'] += int(seconds)
+            bucket = cls.bucket_for(seconds)
+            group[bucket] = group.get(bucket, 0) + 1
+
+        for (date, csm_id, from_stage, to_stage), increments in groups.items():
+            rows = cls.objects.filter(date=date, csm_id=csm_id, from_stage=from_stage, to_stage=to_stage)
+            if rows.update(**{field: models.F(field) + n for field, n in increments.items()}):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(date=date, csm_id=csm_id, from_stage=from_stage, to_stage=to_stage, **increments)
+            except IntegrityError:
+                # Another writer created the row first
+                rows.update(**{field: models.F(field) + n for field, n in increments.items()})
+
+
+class StageCount(models.Model):
+    """
+    Clients currently in each stage, per active assignee (csm null: unassigned).
+    Maintained by set_stage, assign and client creation/deletion; rebuild with `manage.py rebuild_stage_analytics`.
+    """
+    stage = models.CharField(max_length=50)
+    csm = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stage', 'csm'], condition=models.Q(csm__isnull=False), name='unique_stage_count'),
+            models.UniqueConstraint(fields=['stage'], condition=models.Q(csm__isnull=True), name='unique_unassigned_stage_count'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage}: {self.count}"
+
+    @classmethod
+    def shift(cls, changes):
+        """
+        Apply count deltas with one UPDATE (or INSERT) per key.
+
+        Args:
+            changes: Iterable of (stage, csm_id, delta)
+        """
+        deltas = {}
+        for stage, csm_id, delta in changes:
+            deltas[(stage, csm_id)] = deltas.get((stage, csm_id), 0) + delta
+
+        for (stage, csm_id), delta in deltas.items():
+            if not delta:
+                continue
+            rows = cls.objects.filter(stage=stage, csm_id=csm_id)
+            if rows.update(count=models.F('count') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(stage=stage, csm_id=csm_id, count=delta)
+            except IntegrityError:
+                # Another writer created the row first
+                rows.update(count=models.F('count') + delta)
@@ -0,0 +1,54 @@
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError(cursor)
+        return created_at, int(pk)
+    except ValueError as e:
+        raise InvalidCursor(cursor) from e
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        limit = int(value) if value else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of `queryset` ordered newest first on (created_at, id).
+
+    Seeks past `cursor` instead of using OFFSET, so every page costs the same
+    index range scan. Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].pk)
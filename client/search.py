@@ -0,0 +1,283 @@
+"""
+Client search index.
+
+Every Client carries `search_text`: lowercased name, email and digits-only phone, rebuilt on save.
+It is indexed per database:
+
+    PostgreSQL  GIN trigram index (pg_trgm) on search_text: substring, prefix and typo-tolerant
+                (word similarity) matches, ranked by similarity.
+    SQLite      FTS5 external-content table `client_search` with the trigram tokenizer, kept in
+                sync by triggers. Substring matches, or failing those, matches with one
+                character wrong, ranked by bm25.
+
+Terms shorter than a trigram fall back to ClientQuerySet.search, which uses the plain btree indexes.
+
+The extracted `context` is indexed too, for finding leads by what they asked about:
+
+    PostgreSQL  GIN index on jsonb_to_tsvector(context) (string and numeric values), plus
+                expression indexes on LOWER(context ->> key) for intent, urgency and sentiment.
+    SQLite      FTS5 table `client_context_search` (porter stemming) over the context values,
+                kept in sync by triggers, plus expression indexes on LOWER(JSON_EXTRACT(...)).
+"""
+import re
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, TextField, When
+from django.db.models.expressions import RawSQL
+
+MIN_TERM_LENGTH = 3
+SIMILARITY_THRESHOLD = 0.4
+
+
+CONTEXT_FILTER_KEYS = ('intent', 'urgency', 'sentiment')
+
+
+def sqlite_fts_triggers(fts, table, column):
+    """Triggers keeping an external-content FTS5 table in step with `table`.`column`."""
+    insert = f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});"
+    return {
+        f'{fts}_ai': f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f'{fts}_ad': f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f'{fts}_au': f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN {delete} {insert} END",
+    }
+
+
+def install_sqlite_fts(cursor, fts, table, column, tokenize):
+    """Create the FTS5 table and any missing triggers; rebuild the index if triggers had to be (re)created."""
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', tokenize='{tokenize}')"
+    )
+    triggers = sqlite_fts_triggers(fts, table, column)
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table])
+    missing = set(triggers) - {row[0] for row in cursor.fetchall()}
+    for name in sorted(missing):
+        cursor.execute(triggers[name])
+    if missing:
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_sqlite_fts(cursor, fts, table, column):
+    for name in sqlite_fts_triggers(fts, table, column):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def _context_values(column):
+    # Every scalar in the context document, nested loan_details included; keys are left out so
+    # searching "intent" doesn't match every client
+    return f"(SELECT group_concat(value, ' ') FROM json_tree({column}) WHERE type IN ('text', 'integer', 'real'))"
+
+
+# A standalone FTS5 table rather than external content: it indexes the extracted values, not the raw JSON
+CONTEXT_TRIGGERS = {
+    'client_context_search_ai': f"""CREATE TRIGGER client_context_search_ai AFTER INSERT ON client_client BEGIN
+        INSERT INTO client_context_search(rowid, context) VALUES (new.id, {_context_values('new.context')}); END""",
+    'client_context_search_ad': """CREATE TRIGGER client_context_search_ad AFTER DELETE ON client_client BEGIN
+        DELETE FROM client_context_search WHERE rowid = old.id; END""",
+    'client_context_search_au': f"""CREATE TRIGGER client_context_search_au AFTER UPDATE OF context ON client_client BEGIN
+        DELETE FROM client_context_search WHERE rowid = old.id;
+        INSERT INTO client_context_search(rowid, context) VALUES (new.id, {_context_values('new.context')}); END""",
+}
+
+
+def context_key_sql(key, vendor=None):
+    """SQL for a lowercased top-level context value; identical to the expression index on it."""
+    vendor = vendor or connection.vendor
+    if vendor == 'postgresql':
+        return f"LOWER(\"client_client\".\"context\" ->> '{key}')"
+    return f"LOWER(JSON_EXTRACT(\"client_client\".\"context\", '$.{key}'))"
+
+
+def install_search_index(connection):
+    """
+    Create the indexes for this database if they are missing. Idempotent; run by the migrations
+    and after every migrate, because SQLite's table rebuilds for later ALTERs drop triggers and indexes.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute('CREATE INDEX IF NOT EXISTS client_search_trgm ON client_client USING gin (search_text gin_trgm_ops)')
+        elif connection.vendor == 'sqlite':
+            install_sqlite_fts(cursor, 'client_search', 'client_client', 'search_text', 'trigram')
+
+
+def install_context_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS client_context_fts ON client_client "
+                "USING gin (jsonb_to_tsvector('english', context, '[\"string\", \"numeric\"]'))"
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS client_context_search USING fts5(context, tokenize='porter unicode61')")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'client_client'")
+            missing = set(CONTEXT_TRIGGERS) - {row[0] for row in cursor.fetchall()}
+            for name in sorted(missing):
+                cursor.execute(CONTEXT_TRIGGERS[name])
+            if missing:
+                cursor.execute('DELETE FROM client_context_search')
+                cursor.execute(f'INSERT INTO client_context_search(rowid, context) SELECT id, {_context_values("context")} FROM client_client')
+        else:
+            return
+        for key in CONTEXT_FILTER_KEYS:
+            expression = context_key_sql(key, connection.vendor).replace('"client_client".', '')
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS client_context_{key} ON client_client (({expression}))')
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS client_search_trgm')
+        elif connection.vendor == 'sqlite':
+            drop_sqlite_fts(cursor, 'client_search', 'client_client', 'search_text')
+
+
+def drop_context_index(connection):
+    with connection.cursor() as cursor:
+        for key in CONTEXT_FILTER_KEYS:
+            cursor.execute(f'DROP INDEX IF EXISTS client_context_{key}')
+        if connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS client_context_fts')
+        elif connection.vendor == 'sqlite':
+            for name in CONTEXT_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute('DROP TABLE IF EXISTS client_context_search')
+
+
+def normalize_phone(value):
+    """Digits only; how phones arriving from chat and imports are stored."""
+    return re.sub(r'\D', '', value or '')
+
+
+def build_search_text(name, email, phone):
+    return ' '.join(filter(None, [(name or '').lower(), (email or '').lower(), normalize_phone(phone)]))
+
+
+def normalize_term(term):
+    term = term.strip().lower()
+    # A formatted phone number, e.g. "(555) 010-2030", is matched against the stored digits
+    if re.search(r'\d', term) and not re.search(r'[a-z@]', term):
+        return normalize_phone(term)
+    return term
+
+
+def search_clients(queryset, term, limit=20):
+    """Return up to `limit` clients from `queryset` matching `term`, best match first."""
+    term = normalize_term(term)
+    if not term:
+        return []
+    if len(term) < MIN_TERM_LENGTH:
+        return list(queryset.search(term).order_by('-created_at', '-id')[:limit])
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, term, limit)
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(queryset, term, limit)
+    return list(queryset.filter(search_text__contains=term).order_by('-created_at', '-id')[:limit])
+
+
+def _postgres_search(queryset, term, limit):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    with connection.cursor() as cursor:
+        # Threshold for the %> operator, which is what lets the GIN index serve similarity matches
+        cursor.execute('SET pg_trgm.word_similarity_threshold = %s', [SIMILARITY_THRESHOLD])
+    return list(
+        queryset.filter(Q(search_text__contains=term) | Q(search_text__trigram_word_similar=term))
+        .annotate(rank=TrigramWordSimilarity(term, 'search_text'))
+        .order_by('-rank', '-id')[:limit]
+    )
+
+
+def _quote(text):
+    return '"{}"'.format(text.replace('"', '""'))
+
+
+def _typo_query(term):
+    """
+    FTS5 query matching `term` with any one character wrong: for each position, require every
+    trigram that doesn't touch it. ANDs keep each branch selective, unlike OR-ing all trigrams.
+    """
+    trigrams = [term[i:i + 3] for i in range(len(term) - 2)]
+    if len(trigrams) < 4:
+        return ' OR '.join(_quote(t) for t in sorted(set(trigrams)))
+    branches = set()
+    for position in range(len(term)):
+        kept = tuple(sorted({t for i, t in enumerate(trigrams) if not position - 2 <= i <= position}))
+        if kept:
+            branches.add(kept)
+    return ' OR '.join('(' + ' AND '.join(_quote(t) for t in kept) + ')' for kept in sorted(branches))
+
+
+def _sqlite_search(queryset, term, limit):
+    # Substring hits, newest first (FTS5 walks rowids in order, so there is no ranking pass).
+    # Only when there are none does it fall back to single-typo matches ranked by bm25.
+    # Over-fetch so the caller's filters (stage, ...) still leave `limit` rows.
+    fetch = limit * 5
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid FROM client_search WHERE client_search MATCH %s ORDER BY rowid DESC LIMIT %s',
+            [_quote(term), fetch],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            cursor.execute(
+                'SELECT rowid FROM client_search WHERE client_search MATCH %s ORDER BY bm25(client_search) LIMIT %s',
+                [_typo_query(term), fetch],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return []
+    order = Case(*[When(pk=pk, then=i) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return list(queryset.filter(pk__in=ids).order_by(order)[:limit])
+
+
+def search_words(term):
+    """Words and numbers ("6.5") in `term`; everything else, including query syntax, is dropped."""
+    return re.findall(r'\w+(?:\.\w+)*', term.lower())
+
+
+def fts_query(words):
+    """
+    Full-text query requiring every word, each as a prefix of a stemmed token: stemmers cut
+    "refinance" and "refinancing" differently, and "refinanc" alone would miss the former.
+    """
+    if connection.vendor == 'postgresql':
+        return ' & '.join(f'{word}:*' for word in words)
+    return ' '.join(f'{_quote(word)}*' for word in words)
+
+
+def context_matches(term):
+    """Q matching clients whose context values contain every word of `term`."""
+    words = search_words(term)
+    if not words:
+        return Q(pk__in=[])
+    if connection.vendor == 'postgresql':
+        return Q(id__in=RawSQL(
+            "SELECT id FROM client_client WHERE jsonb_to_tsvector('english', context, '[\"string\", \"numeric\"]') "
+            "@@ to_tsquery('english', %s)", [fts_query(words)]
+        ))
+    if connection.vendor == 'sqlite':
+        return Q(id__in=RawSQL(
+            'SELECT rowid FROM client_context_search WHERE client_context_search MATCH %s', [fts_query(words)]
+        ))
+    return Q(context__icontains=term)
+
+
+def filter_context(queryset, **values):
+    """
+    Filter on top-level context values (intent='refinance', urgency='high', ...), case-insensitively.
+
+    Uses the same SQL as the client_context_<key> expression indexes so the planner can pick them;
+    Django's own KeyTextTransform compiles differently on SQLite and would scan.
+    """
+    for key, value in values.items():
+        if key not in CONTEXT_FILTER_KEYS:
+            raise ValueError(f'Unsupported context filter: {key}')
+        if connection.vendor in ('postgresql', 'sqlite'):
+            alias = f'context_{key}'
+            queryset = queryset.alias(**{alias: RawSQL(context_key_sql(key), [], output_field=TextField())})
+            queryset = queryset.filter(**{alias: value.strip().lower()})
+        else:
+            queryset = queryset.filter(**{f'context__{key}__iexact': value.strip()})
+    return queryset
@@ -1,40 +1,33 @@
 import os
 import json
-from openai import OpenAI
+import time
+import asyncio
+import hashlib
+import logging
+import weakref
+import openai
+from django.conf import settings
+from django.core.cache import cache
+from openai import AsyncOpenAI, OpenAI
+from rivo import metrics
+from .circuit import CircuitBreaker, CircuitOpen
 
+logger = logging.getLogger(__name__)
 
-def get_openai_client():
-    return OpenAI(
-        api_key=os.environ.get("AI_INTEGRATIONS_OPENAI_API_KEY"),
-        base_url=os.environ.get("AI_INTEGRATIONS_OPENAI_BASE_URL")
-    )
-
+SUMMARY_CACHE_TIMEOUT = 60 * 60 * 24
 
-def summarize_chat_history(messages):
-    """
-    Use OpenAI to summarize chat history and extract key context.
-    
-    Args:
-        messages: List of chat messages with 'sender_type' and 'message' keys
-    
-    Returns:
-        dict: Structured context with intent, preferences, key_points, etc.
-    """
-    if not messages:
-        return {}
-    
-    chat_transcript = "\n".join([
-        f"{'Client' if m.get('sender_type') == 'client' else 'Bot'}: {m.get('message', '')}"
-        for m in messages
-    ])
-    
-    prompt = f"""Analyze this mortgage-related chat conversation and extract key information in JSON format.
+# Errors that mean the model service itself is unhealthy; they count against the breaker
+UPSTREAM_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
 
-Chat Transcript:
-{chat_transcript}
+llm_breaker = CircuitBreaker(
+    'openai',
+    failure_rate=settings.LLM_BREAKER_FAILURE_RATE,
+    min_calls=settings.LLM_BREAKER_MIN_CALLS,
+    window=settings.LLM_BREAKER_WINDOW,
+    cooldown=settings.LLM_BREAKER_COOLDOWN,
+)
 
-Extract and return a JSON object with these fields:
-- intent: What is the client's main goal? (e.g., refinance, new mortgage, loan inquiry)
+CONTEXT_FIELDS = """- intent: What is the client's main goal? (e.g., refinance, new mortgage, loan inquiry)
 - loan_details: Object with any mentioned loan information:
   - current_loan_amount: Amount if mentioned (string or null)
   - monthly_payment: Current payment if mentioned (string or null)
@@ -47,40 +40,223 @@ Extract and return a JSON object with these fields:
 - preferences: Any preferences mentioned (list of strings)
 - sentiment: Overall sentiment (positive/neutral/negative)
 - urgency: How urgent is their need? (low/medium/high)
-- summary: Brief 1-2 sentence summary focusing on their mortgage needs
+- summary: Brief 1-2 sentence summary focusing on their mortgage needs"""
+
+
+SYSTEM_PROMPT = "You are a mortgage industry assistant that extracts structured information from client conversations. Focus on loan details, financial information, and mortgage-related needs. Always respond with valid JSON only."
+
+
+def _client_options():
+    return {
+        "api_key": os.environ.get("AI_INTEGRATIONS_OPENAI_API_KEY"),
+        "base_url": os.environ.get("AI_INTEGRATIONS_OPENAI_BASE_URL"),
+        "timeout": openai.Timeout(settings.OPENAI_READ_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+        "max_retries": settings.OPENAI_MAX_RETRIES,
+    }
+
+
+_openai_client = None
+_async_openai_clients = weakref.WeakKeyDictionary()  # event loop -> client; an async pool can't outlive its loop
+
+
+def get_openai_client():
+    """Process-wide client, so its HTTP connection pool is reused across calls."""
+    global _openai_client
+    if _openai_client is None:
+        if settings.LLM_BACKEND == 'fake':
+            from .fake_llm import FakeOpenAI
+            _openai_client = FakeOpenAI()
+        else:
+            _openai_client = OpenAI(**_client_options())
+    return _openai_client
+
+
+def get_async_openai_client():
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        if settings.LLM_BACKEND == 'fake':
+            from .fake_llm import FakeAsyncOpenAI
+            client = FakeAsyncOpenAI()
+        else:
+            client = AsyncOpenAI(**_client_options())
+        _async_openai_clients[loop] = client
+    return client
+
+
+def _record_call(started, response=None, error=None):
+    seconds = time.perf_counter() - started
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    if error is None:
+        outcome = "ok"
+    elif isinstance(error, openai.APITimeoutError):
+        outcome = "timeout"
+    else:
+        outcome = "error"
+
+    llm_breaker.record(failed=isinstance(error, UPSTREAM_ERRORS))
+    metrics.record_llm(outcome, seconds, prompt_tokens, completion_tokens)
+    if error is None:
+        logger.info("Summary call took %.2fs (%d prompt + %d completion tokens)", seconds, prompt_tokens, completion_tokens)
+    else:
+        logger.warning("Summary call failed after %.2fs: %s", seconds, error)
+
+
+def _create_completion(request):
+    try:
+        llm_breaker.before_call()
+    except CircuitOpen:
+        metrics.record_llm("rejected")
+        raise
+    started = time.perf_counter()
+    try:
+        response = get_openai_client().chat.completions.create(**request)
+    except Exception as e:
+        _record_call(started, error=e)
+        raise
+    _record_call(started, response=response)
+    return response
+
+
+async def _acreate_completion(request):
+    try:
+        llm_breaker.before_call()
+    except CircuitOpen:
+        metrics.record_llm("rejected")
+        raise
+    started = time.perf_counter()
+    try:
+        response = await get_async_openai_client().chat.completions.create(**request)
+    except Exception as e:
+        _record_call(started, error=e)
+        raise
+    _record_call(started, response=response)
+    return response
+
+
+def build_summary_prompt(chat_transcript, previous_context=None):
+    if not previous_context:
+        return f"""Analyze this mortgage-related chat conversation and extract key information in JSON format.
+
+Chat Transcript:
+{chat_transcript}
+
+Extract and return a JSON object with these fields:
+{CONTEXT_FIELDS}
+
+Return ONLY valid JSON, no other text."""
+
+    return f"""Update the context previously extracted from a mortgage-related chat conversation with the new messages below.
+
+Previous Context:
+{json.dumps(previous_context, sort_keys=True)}
+
+New Messages:
+{chat_transcript}
+
+Keep previous values unless the new messages add to or change them, and return the full updated JSON object with these fields:
+{CONTEXT_FIELDS}
 
 Return ONLY valid JSON, no other text."""
 
+
+def _prepare_summary(messages, previous_context):
+    chat_transcript = "\n".join([
+        f"{'Client' if m.get('sender_type') == 'client' else 'Bot'}: {m.get('message', '')}"
+        for m in messages
+    ])
+    prompt = build_summary_prompt(chat_transcript, previous_context)
+    request = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 500
+    }
+    return request, f"chat_summary:{hashlib.sha256(prompt.encode()).hexdigest()}"
+
+
+def _parse_response(response):
+    content = response.choices[0].message.content.strip()
+    
+    if content.startswith("```"):
+        content = content.split("```")[1]
+        if content.startswith("json"):
+            content = content[4:]
+        content = content.strip()
+    
     try:
-        openai_client = get_openai_client()
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a mortgage industry assistant that extracts structured information from client conversations. Focus on loan details, financial information, and mortgage-related needs. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=500
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:]
-            content = content.strip()
-        
         return json.loads(content)
-    
-    except json.JSONDecodeError:
+    except json.JSONDecodeError as e:
+        e.content = content
+        raise
+
+
+def _failure_context(error, fail_silently):
+    if not fail_silently:
+        raise error
+    if isinstance(error, json.JSONDecodeError):
         return {
             "intent": "Unable to parse",
             "summary": "Chat history collected but parsing failed",
-            "raw_response": content if 'content' in locals() else None
+            "raw_response": getattr(error, 'content', None)
         }
+    return {
+        "error": str(error),
+        "summary": "Failed to summarize chat history"
+    }
+
+
+def summarize_chat_history(messages, previous_context=None, fail_silently=True):
+    """
+    Use OpenAI to summarize chat history and extract key context.
+    
+    Summarization is incremental: pass the context from an earlier run as
+    `previous_context` and only the messages since then. Results are cached
+    by a hash of the prompt, so identical inputs never call the model twice.
+    
+    Args:
+        messages: List of chat messages with 'sender_type' and 'message' keys
+        previous_context: Context returned by an earlier call, to be updated
+        fail_silently: If False, API and parse errors (and CircuitOpen while the model
+            service is failing) are raised instead of returned as an error context
+    
+    Returns:
+        dict: Structured context with intent, preferences, key_points, etc.
+    """
+    if not messages:
+        return previous_context or {}
+    
+    request, cache_key = _prepare_summary(messages, previous_context)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        context = _parse_response(_create_completion(request))
     except Exception as e:
-        return {
-            "error": str(e),
-            "summary": "Failed to summarize chat history"
-        }
+        return _failure_context(e, fail_silently)
+    cache.set(cache_key, context, SUMMARY_CACHE_TIMEOUT)
+    return context
+
+
+async def asummarize_chat_history(messages, previous_context=None, fail_silently=True):
+    """Async counterpart of summarize_chat_history, using the async OpenAI client."""
+    if not messages:
+        return previous_context or {}
+    
+    request, cache_key = _prepare_summary(messages, previous_context)
+    cached = await cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        context = _parse_response(await _acreate_completion(request))
+    except Exception as e:
+        return _failure_context(e, fail_silently)
+    await cache.aset(cache_key, context, SUMMARY_CACHE_TIMEOUT)
+    return context
@@ -0,0 +1,32 @@
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .models import Client, StageCount
+from .search import install_context_index, install_search_index
+
+
+@receiver(post_migrate)
+def reinstall_search_index(sender, app_config, using, **kwargs):
+    # SQLite rebuilds client_client for many ALTERs, which drops the FTS triggers and raw indexes
+    # Only once the migrations that created them are applied, so migrating backwards doesn't bring them back
+    if app_config.name != 'client':
+        return
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('client', '0013_client_search') in applied:
+        install_search_index(connection)
+    if ('client', '0014_client_context_index') in applied:
+        install_context_index(connection)
+
+
+@receiver(post_save, sender=Client)
+def count_new_client(sender, instance, created, **kwargs):
+    # bulk_create skips this; callers that use it shift StageCount themselves
+    if created:
+        StageCount.shift([(instance.current_stage, instance.active_assignee_id, 1)])
+
+
+@receiver(post_delete, sender=Client)
+def uncount_client(sender, instance, **kwargs):
+    StageCount.shift([(instance.current_stage, instance.active_assignee_id, -1)])
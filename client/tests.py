@@ -0,0 +1,63 @@
+import uuid
+from unittest import mock
+from django.db import OperationalError
+from django.test import TestCase
+from chat.models import ChatHistory
+from .jobs import enqueue_summary, run_pending
+from .models import Client, SummaryJob
+
+
+class SummaryJobTests(TestCase):
+    def setUp(self):
+        self.client_obj = Client.objects.create(name='Ann Lee', email='ann@example.com', phone='5550102030')
+        self.session_id = uuid.uuid4()
+        ChatHistory.objects.create(session_id=self.session_id, client=self.client_obj, message='Rates?', sender_type='client')
+
+    def test_failure_after_summarizing_is_retried(self):
+        enqueue_summary(self.client_obj, self.session_id)
+        with mock.patch.object(Client, 'initialize', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('client.jobs', 'WARNING'):
+            self.assertEqual(run_pending(), 1)
+
+        job = SummaryJob.objects.get(client=self.client_obj)
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('database is locked', job.last_error)
+        self.client_obj.refresh_from_db()
+        self.assertEqual(self.client_obj.context_last_message_id, None)  # rolled back with the failed initialize
+
+    def test_enqueue_while_running_waits_for_the_worker(self):
+        enqueue_summary(self.client_obj, self.session_id)
+        SummaryJob.objects.filter(client=self.client_obj).update(status='running', attempts=2)
+
+        enqueue_summary(self.client_obj, self.session_id)
+        job = SummaryJob.objects.get(client=self.client_obj)
+        self.assertEqual((job.status, job.attempts, job.dirty), ('running', 2, True))
+
+    def test_dirty_job_is_queued_again_when_its_run_finishes(self):
+        enqueue_summary(self.client_obj, self.session_id)
+
+        def enqueue_mid_run(*args, **kwargs):
+            enqueue_summary(self.client_obj, self.session_id)
+            return {'intent': 'refinance'}
+
+        with mock.patch('client.jobs.summarize_chat_history', side_effect=enqueue_mid_run):
+            self.assertEqual(run_pending(), 1)
+        job = SummaryJob.objects.get(client=self.client_obj)
+        self.assertEqual((job.status, job.dirty), ('pending', False))
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(SummaryJob.objects.get(client=self.client_obj).status, 'done')
+
+    def test_enqueue_keeps_attempts_of_a_failing_job(self):
+        enqueue_summary(self.client_obj, self.session_id)
+        SummaryJob.objects.filter(client=self.client_obj).update(status='pending', attempts=3)
+
+        enqueue_summary(self.client_obj, self.session_id)
+        self.assertEqual(SummaryJob.objects.get(client=self.client_obj).attempts, 3)
+
+
+class ClientSearchTests(TestCase):
+    def test_mixed_case_email_is_stored_lowercased_and_found_by_prefix(self):
+        client = Client.objects.create(name='Foo Bar', email=' Foo.Bar@Example.com')
+        self.assertEqual(client.email, 'foo.bar@example.com')
+        self.assertEqual(list(Client.objects.search('Foo.Bar@Ex')), [client])
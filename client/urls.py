@@ -5,5 +5,11 @@ app_name = 'client'
 
 urlpatterns = [
     path('', views.clients, name='list'),
+    path('mine/', views.my_clients, name='mine'),
+    path('search/', views.search, name='search'),
+    path('mentions/', views.mentions, name='mentions'),
+    path('bulk/', views.bulk_update, name='bulk'),
+    path('analytics/', views.analytics, name='analytics'),
     path('<int:pk>/', views.client_detail, name='detail'),
+    path('<int:pk>/history/', views.client_history, name='history'),
 ]
@@ -2,9 +2,23 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .models import Client
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from chat.models import last_message_at
+from chat.search import matching_messages
+from .analytics import stage_report
+from .cache import get_detail_payload, serialize_history
+from .models import Client, ClientAssignment, ClientStageHistory
+from .pagination import InvalidCursor, keyset_page, parse_limit
+from .search import CONTEXT_FILTER_KEYS, context_matches, filter_context, search_clients
 from account.models import User
 
+MENTION_SNIPPETS = 3
+
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
@@ -17,16 +31,179 @@ def clients(request):
         )
         return Response({'id': client.id}, status=status.HTTP_201_CREATED)
     
-    data = []
-    for c in Client.objects.all().prefetch_related('assignments__assigned_to'):
-        a = c.assignments.filter(is_active=True).first()
-        data.append({
-            'id': c.id, 'name': c.name, 'email': c.email, 'phone': c.phone,
-            'stage': c.current_stage, 'assigned_to': a.assigned_to.email if a and a.assigned_to else None,
-            'context': c.context
-        })
+    queryset = Client.objects.with_active_assignee()
+    stage = request.query_params.get('stage')
+    if stage:
+        queryset = queryset.filter(current_stage=stage)
+    
+    try:
+        page, next_cursor = keyset_page(queryset, request.query_params.get('cursor'), parse_limit(request.query_params.get('limit')))
+    except InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = [{
+        'id': c.id, 'name': c.name, 'email': c.email, 'phone': c.phone,
+        'stage': c.current_stage, 'assigned_to': c.assigned_to_email, 'context': c.context
+    } for c in page]
+    
+    return Response({'clients': data, 'next': next_cursor, 'stages': dict(Client.STAGE_CHOICES)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """Ranked, typo-tolerant lookup by partial name, email fragment or formatted phone (see client/search.py)."""
+    params = request.query_params
+    queryset = Client.objects.with_active_assignee()
+    if params.get('stage'):
+        queryset = queryset.filter(current_stage=params['stage'])
+    
+    results = search_clients(queryset, params.get('q', ''), parse_limit(params.get('limit'), default=20, maximum=100))
+    data = [{
+        'id': c.id, 'name': c.name, 'email': c.email, 'phone': c.phone,
+        'stage': c.current_stage, 'assigned_to': c.assigned_to_email
+    } for c in results]
+    
+    return Response({'clients': data, 'query': params.get('q', '')})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def mentions(request):
+    """
+    Clients whose chats or extracted context mention `q` (e.g. "refinance", "6.5"), optionally
+    narrowed by context intent/urgency/sentiment and stage. Full-text indexed; see chat/search.py.
+    """
+    params = request.query_params
+    term = params.get('q', '').strip()
+    filters = {key: params[key] for key in CONTEXT_FILTER_KEYS if params.get(key)}
+    if not term and not filters:
+        return Response({'error': 'q or one of intent, urgency, sentiment required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    queryset = filter_context(Client.objects.with_active_assignee(), **filters)
+    if params.get('stage'):
+        queryset = queryset.filter(current_stage=params['stage'])
+    if term:
+        queryset = queryset.filter(Q(id__in=matching_messages(term).values('owner_id')) | context_matches(term))
+    
+    try:
+        page, next_cursor = keyset_page(queryset, params.get('cursor'), parse_limit(params.get('limit')))
+    except InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Latest few matching messages per client on the page, in one query
+    snippets = {}
+    if term and page:
+        hits = matching_messages(term).filter(owner_id__in=[c.id for c in page]).annotate(
+            rank=Window(RowNumber(), partition_by=F('owner_id'), order_by=F('id').desc())
+        ).filter(rank__lte=MENTION_SNIPPETS).order_by('owner_id', 'rank')
+        for m in hits:
+            snippets.setdefault(m.owner_id, []).append({
+                'id': m.id, 'session_id': str(m.session_id), 'message': m.message,
+                'sender_type': m.sender_type, 'sent_at': m.sent_at
+            })
     
-    return Response({'clients': data, 'stages': dict(Client.STAGE_CHOICES)})
+    data = [{
+        'id': c.id, 'name': c.name, 'email': c.email, 'phone': c.phone,
+        'stage': c.current_stage, 'assigned_to': c.assigned_to_email,
+        'context': {key: c.context.get(key) for key in (*CONTEXT_FILTER_KEYS, 'loan_details', 'summary')},
+        'messages': snippets.get(c.id, [])
+    } for c in page]
+    
+    return Response({'clients': data, 'next': next_cursor, 'query': term})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_clients(request):
+    # Driven from ClientAssignment(assigned_to, is_active), so cost scales with the user's book
+    assignments = (
+        ClientAssignment.objects.filter(assigned_to=request.user, is_active=True)  # type: ignore
+        .select_related('client').annotate(last_message_at=last_message_at('client'))
+    )
+    
+    try:
+        page, next_cursor = keyset_page(assignments, request.query_params.get('cursor'), parse_limit(request.query_params.get('limit')))
+    except InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = [{
+        'id': a.client.id, 'name': a.client.name, 'email': a.client.email, 'phone': a.client.phone,
+        'stage': a.client.current_stage, 'assigned_at': a.created_at.isoformat(),
+        'last_activity': max(filter(None, [a.client.updated_at, a.last_message_at])).isoformat()
+    } for a in page]
+    
+    return Response({'clients': data, 'next': next_cursor, 'stages': dict(Client.STAGE_CHOICES)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def analytics(request):
+    """Stage counts, conversion between consecutive stages and time-in-stage per CSM (default: last 30 days)."""
+    params = request.query_params
+    try:
+        # parse_date returns None for a malformed date and raises ValueError for an impossible one (2024-02-30)
+        end = parse_date(params['end']) if params.get('end') else timezone.localdate()
+        start = parse_date(params['start']) if params.get('start') else end and end - timedelta(days=30)
+    except ValueError:
+        start = end = None
+    if not start or not end:
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        csm_id = int(params['csm']) if params.get('csm') else None
+    except ValueError:
+        return Response({'error': 'csm must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    report = stage_report(start, end, csm_id=csm_id)
+    return Response({'start': start.isoformat(), 'end': end.isoformat(), **report})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_update(request):
+    """
+    Change the stage of, and/or reassign, many clients at once.
+    
+    Select clients with `ids`, or with `filter` ({'stage': ..., 'assigned_to': user_id});
+    then set `stage` and/or `assign_to`.
+    """
+    data = request.data
+    stage, assign_to, remarks = data.get('stage'), data.get('assign_to'), data.get('remarks', '')
+    if not stage and not assign_to:
+        return Response({'error': 'stage or assign_to required'}, status=status.HTTP_400_BAD_REQUEST)
+    if stage and stage not in dict(Client.STAGE_CHOICES):
+        return Response({'error': 'Invalid stage'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if assign_to:
+        try:
+            assign_to = User.objects.get(pk=assign_to, is_active=True)
+        except (User.DoesNotExist, ValueError):
+            return Response({'error': 'Invalid assign_to'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        if data.get('ids'):
+            clients = Client.objects.filter(id__in=data['ids'])
+        elif data.get('filter'):
+            filters = data['filter']
+            clients = Client.objects.all()
+            if filters.get('stage'):
+                clients = clients.filter(current_stage=filters['stage'])
+            if filters.get('assigned_to'):
+                clients = clients.filter(active_assignee=filters['assigned_to'])
+        else:
+            return Response({'error': 'ids or filter required'}, status=status.HTTP_400_BAD_REQUEST)
+    except (TypeError, ValueError, AttributeError):
+        return Response({'error': 'Invalid ids or filter'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    result = {}
+    with transaction.atomic():
+        # Pin the selection so the first change can't alter which clients the second one matches
+        clients = Client.objects.filter(id__in=list(clients.select_for_update().values_list('id', flat=True)))
+        if stage:
+            result['stage_changed'] = clients.set_stage(stage, changed_by=request.user, remarks=remarks)
+        if assign_to:
+            result['reassigned'] = clients.assign(assigned_to=assign_to, assigned_by=request.user, remarks=remarks)
+    return Response(result)
 
 
 @api_view(['GET', 'PUT', 'DELETE'])
@@ -60,11 +237,17 @@ def client_detail(request, pk):
         
         return Response({'message': 'Updated'})
     
-    history = [{'from': h.from_stage, 'to': h.to_stage, 'by': h.changed_by.email if h.changed_by else None, 'at': h.created_at.isoformat()} 
-               for h in client.stage_history.select_related('changed_by')]
+    payload, hit = get_detail_payload(client)
+    return Response(payload, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def client_history(request, pk):
+    history = ClientStageHistory.objects.filter(client_id=pk).select_related('changed_by')  # type: ignore
+    try:
+        page, next_cursor = keyset_page(history, request.query_params.get('cursor'), parse_limit(request.query_params.get('limit')))
+    except InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response({
-        'client': {'id': client.id, 'name': client.name, 'email': client.email, 'phone': client.phone, 
-                   'stage': client.current_stage, 'context': client.context},
-        'history': history, 'stages': dict(Client.STAGE_CHOICES)
-    })
+    return Response({'history': [serialize_history(h) for h in page], 'next': next_cursor})
@@ -0,0 +1,35 @@
+import uuid
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from account.models import User
+from chat.models import ChatHistory
+from client.models import Client
+from rivo.testing import assert_query_budget
+
+
+class MyClientsTabTests(TestCase):
+    def setUp(self):
+        self.csm = User.objects.create_user(username='csm', email='csm@example.com', password='x')
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        self.mine = Client.objects.create(name='Ann Lee')
+        self.mine.assign(assigned_to=self.csm)
+        Client.objects.create(name='Bob Ray').assign(assigned_to=other)
+        Client.objects.create(name='Cy Unassigned')
+        self.client.force_login(self.csm)
+
+    def test_lists_only_the_users_book_with_last_activity(self):
+        chatted_at = timezone.now() + timedelta(hours=1)
+        ChatHistory.objects.create(session_id=uuid.uuid4(), client=self.mine, message='hi', sender_type='client', sent_at=chatted_at)
+
+        with assert_query_budget('dashboard:home'):
+            response = self.client.get('/dashboard/', {'tab': 'mine'})
+
+        clients = list(response.context['clients'])
+        self.assertEqual([c.pk for c in clients], [self.mine.pk])
+        self.assertEqual(clients[0].last_activity, chatted_at)
+        self.assertContains(response, 'Last Activity')
+
+    def test_search_stays_within_the_book(self):
+        response = self.client.get('/dashboard/', {'tab': 'mine', 'q': 'bob'})
+        self.assertEqual(list(response.context['clients']), [])
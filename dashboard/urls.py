@@ -9,4 +9,5 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('assign/', views.assign_client, name='assign_client'),
     path('client/<int:client_id>/', views.client_detail, name='client_detail'),
+    path('client/<int:client_id>/history/', views.client_history, name='client_history'),
 ]
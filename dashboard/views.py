@@ -1,10 +1,25 @@
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from client.models import Client
+from django.core.paginator import Paginator
+from django.utils.dateparse import parse_datetime
+from chat.models import last_message_at
+from client.cache import get_detail_payload
+from client.models import Client, ClientStageHistory
+from client.pagination import InvalidCursor, keyset_page
 from account.models import User
 from .forms import LoginForm, StageChangeForm
 
+SORT_OPTIONS = {
+    'newest': ('-created_at', '-id'),
+    'oldest': ('created_at', 'id'),
+    'name': ('name', 'id'),
+    'stage': ('current_stage', '-created_at', '-id'),
+}
+PAGE_SIZES = [25, 50, 100]
+
 
 def login_view(request):
     if request.user.is_authenticated:
@@ -30,19 +45,38 @@ def logout_view(request):
 @login_required
 def home_view(request):
     user = request.user
-    clients = []
+    q = request.GET.get('q', '').strip()
+    stage = request.GET.get('stage', '')
+    sort = request.GET.get('sort') if request.GET.get('sort') in SORT_OPTIONS else 'newest'
+    page_size = request.GET.get('page_size', '')
+    page_size = int(page_size) if page_size in map(str, PAGE_SIZES) else PAGE_SIZES[0]
+    
+    tab = 'mine' if request.GET.get('tab') == 'mine' else 'all'
     
-    for c in Client.objects.all().prefetch_related('assignments__assigned_to'):
-        a = c.assignments.filter(is_active=True).first()
-        c.active_csm = a.assigned_to if a else None  # type: ignore
-        clients.append(c)
+    if tab == 'mine':
+        # Driven from the (active_assignee, -created_at) index: search and sort only touch the user's book
+        clients = Client.objects.filter(active_assignee=user).annotate(last_message_at=last_message_at())
+    else:
+        clients = Client.objects.with_active_assignee()
+    clients = clients.search(q).order_by(*SORT_OPTIONS[sort])
+    if stage in dict(Client.STAGE_CHOICES):
+        clients = clients.filter(current_stage=stage)
+    page = Paginator(clients, page_size).get_page(request.GET.get('page'))
+    if tab == 'mine':
+        for client in page:
+            client.last_activity = max(filter(None, [client.updated_at, client.last_message_at]))
     
-    csm_users = User.objects.filter(is_active=True).exclude(id=user.id) if user.can_assign_client else []
+    can_assign_client = user.can_assign_client
+    csm_users = list(User.objects.filter(is_active=True).exclude(id=user.id)) if can_assign_client else []
+    
+    params = request.GET.copy()
+    params.pop('page', None)
     
     return render(request, 'dashboard/dashboard.html', {
-        'clients': clients, 'csm_users': csm_users, 
-        'perms': {'can_change_client': user.can_change_client, 'can_assign_client': user.can_assign_client},
-        'stage_choices': Client.STAGE_CHOICES
+        'clients': page, 'page': page, 'csm_users': csm_users, 
+        'perms': {'can_change_client': user.can_change_client, 'can_assign_client': can_assign_client},
+        'stage_choices': Client.STAGE_CHOICES, 'sort_options': SORT_OPTIONS.keys(), 'page_sizes': PAGE_SIZES,
+        'filters': {'q': q, 'stage': stage, 'sort': sort, 'page_size': page_size, 'tab': tab}, 'querystring': params.urlencode()
     })
 
 
@@ -73,7 +107,23 @@ def client_detail(request, client_id):
     else:
         form = StageChangeForm(initial={'new_stage': client.current_stage})
     
+    payload, _ = get_detail_payload(client)
+    stage_history = [{**h, 'at': parse_datetime(h['at'])} for h in payload['history']]
+    
     return render(request, 'dashboard/client_detail.html', {
-        'client': client, 'stage_history': client.stage_history.all(),
+        'client': client, 'stage_history': stage_history, 'history_next': payload['history_next'],
         'perms': {'can_change_client': user.can_change_client}, 'form': form
     })
+
+
+@login_required
+def client_history(request, client_id):
+    history = ClientStageHistory.objects.filter(client_id=client_id).select_related('changed_by')  # type: ignore
+    try:
+        page, next_cursor = keyset_page(history, request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    stage_history = [{'from': h.from_stage, 'to': h.to_stage, 'at': h.created_at, 'remarks': h.remarks} for h in page]
+    html = render_to_string('dashboard/_stage_history.html', {'stage_history': stage_history}, request=request)
+    return JsonResponse({'html': html, 'next': next_cursor})
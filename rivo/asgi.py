@@ -3,6 +3,11 @@ ASGI config for rivo project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server to get non-blocking Server-Sent Events from
+``POST /api/v1/chat/stream/events/`` (chat.streaming.stream_events), e.g.:
+
+    gunicorn -k uvicorn.workers.UvicornWorker rivo.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
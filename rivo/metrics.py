@@ -0,0 +1,121 @@
+"""
+Per-view request metrics, exposed in Prometheus text format at /metrics.
+
+Filled by rivo.middleware.QueryMetricsMiddleware. Counters live in process memory, so each
+gunicorn worker reports its own series; scrape every worker (or sum by instance) rather
+than reading a single one.
+"""
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class ViewStats:
+    __slots__ = ('requests', 'errors', 'queries', 'query_seconds', 'seconds', 'response_bytes', 'over_budget', 'buckets')
+
+    def __init__(self):
+        self.requests = self.errors = self.queries = self.response_bytes = self.over_budget = 0
+        self.query_seconds = self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+_stats = defaultdict(ViewStats)
+_llm = {'calls': defaultdict(int), 'seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0}
+_lock = threading.Lock()
+
+
+def record(view, seconds, status, response_bytes, queries=0, query_seconds=0.0, over_budget=False):
+    with _lock:
+        stats = _stats[view]
+        stats.requests += 1
+        stats.errors += status >= 500
+        stats.seconds += seconds
+        stats.queries += queries
+        stats.query_seconds += query_seconds
+        stats.response_bytes += response_bytes
+        stats.over_budget += over_budget
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                stats.buckets[i] += 1
+
+
+def record_llm(outcome, seconds=0.0, prompt_tokens=0, completion_tokens=0):
+    """One model call: outcome is ok, error, timeout, or rejected (circuit breaker open, no call made)."""
+    with _lock:
+        _llm['calls'][outcome] += 1
+        _llm['seconds'] += seconds
+        _llm['prompt_tokens'] += prompt_tokens
+        _llm['completion_tokens'] += completion_tokens
+
+
+def snapshot():
+    with _lock:
+        return {view: {slot: list(s.buckets) if slot == 'buckets' else getattr(s, slot) for slot in ViewStats.__slots__}
+                for view, s in _stats.items()}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _llm.update(calls=defaultdict(int), seconds=0.0, prompt_tokens=0, completion_tokens=0)
+
+
+def render():
+    from client.cache import detail_cache_stats
+    from client.services import llm_breaker
+
+    counters = [
+        ('rivo_requests_total', 'counter', 'Requests handled', 'requests'),
+        ('rivo_request_errors_total', 'counter', 'Requests that returned 5xx', 'errors'),
+        ('rivo_db_queries_total', 'counter', 'SQL queries run', 'queries'),
+        ('rivo_db_query_seconds_total', 'counter', 'Time spent in SQL', 'query_seconds'),
+        ('rivo_response_bytes_total', 'counter', 'Response body bytes', 'response_bytes'),
+        ('rivo_query_budget_exceeded_total', 'counter', 'Requests over their SQL query budget', 'over_budget'),
+    ]
+    stats = snapshot()
+    lines = []
+    for name, kind, help_text, slot in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{{view="{view}"}} {s[slot]}' for view, s in sorted(stats.items())]
+
+    lines += ['# HELP rivo_request_duration_seconds Request latency', '# TYPE rivo_request_duration_seconds histogram']
+    for view, s in sorted(stats.items()):
+        lines += [f'rivo_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}'
+                  for bound, count in zip(LATENCY_BUCKETS, s['buckets'])]
+        lines += [
+            f'rivo_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {s["requests"]}',
+            f'rivo_request_duration_seconds_sum{{view="{view}"}} {s["seconds"]}',
+            f'rivo_request_duration_seconds_count{{view="{view}"}} {s["requests"]}',
+        ]
+
+    cache_stats = detail_cache_stats()
+    lines += ['# HELP rivo_detail_cache_total Client detail cache lookups', '# TYPE rivo_detail_cache_total counter']
+    lines += [f'rivo_detail_cache_total{{result="{result}"}} {cache_stats[result]}' for result in ('hits', 'misses')]
+
+    with _lock:
+        llm = dict(_llm, calls=dict(_llm['calls']))
+    made = sum(n for outcome, n in llm['calls'].items() if outcome != 'rejected')
+    lines += ['# HELP rivo_llm_calls_total Summary model calls by outcome', '# TYPE rivo_llm_calls_total counter']
+    lines += [f'rivo_llm_calls_total{{outcome="{outcome}"}} {n}' for outcome, n in sorted(llm['calls'].items())]
+    lines += [
+        '# HELP rivo_llm_call_seconds Summary model call latency', '# TYPE rivo_llm_call_seconds summary',
+        f'rivo_llm_call_seconds_sum {llm["seconds"]}', f'rivo_llm_call_seconds_count {made}',
+        '# HELP rivo_llm_tokens_total Tokens used by summary calls', '# TYPE rivo_llm_tokens_total counter',
+        f'rivo_llm_tokens_total{{type="prompt"}} {llm["prompt_tokens"]}',
+        f'rivo_llm_tokens_total{{type="completion"}} {llm["completion_tokens"]}',
+        '# HELP rivo_llm_circuit_open 1 while the summary model circuit breaker is open', '# TYPE rivo_llm_circuit_open gauge',
+        f'rivo_llm_circuit_open {int(llm_breaker.is_open)}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    # A scraper presents METRICS_TOKEN; otherwise (and with no token configured) staff sessions only
+    token = settings.METRICS_TOKEN
+    scraper = token and request.headers.get('Authorization') == f'Bearer {token}'
+    if not scraper and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
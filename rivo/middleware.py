@@ -0,0 +1,81 @@
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(view_name):
+    return settings.QUERY_BUDGETS.get(view_name, settings.DEFAULT_QUERY_BUDGET)
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts and times queries; works without DEBUG."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class QueryMetricsMiddleware:
+    """
+    Records latency, SQL count and time, and response size per resolved view (see rivo/metrics.py),
+    and logs a warning when a view runs more queries than its budget in QUERY_BUDGETS.
+
+    Async views run their ORM calls on executor threads this middleware can't wrap, so for them
+    only latency and size are recorded.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, counter)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, seconds, counter=None):
+        match = request.resolver_match
+        if match is None or match.view_name == 'metrics':
+            return
+        view = match.view_name
+
+        over_budget = False
+        if counter is not None:
+            budget = query_budget(view)
+            over_budget = budget is not None and counter.count > budget
+            if over_budget:
+                logger.warning('%s ran %d queries (budget %d) for %s %s', view, counter.count, budget, request.method, request.path)
+
+        metrics.record(
+            view, seconds, response.status_code,
+            0 if response.streaming else len(response.content),
+            counter.count if counter else 0, counter.seconds if counter else 0.0, over_budget,
+        )
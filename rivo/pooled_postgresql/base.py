@@ -0,0 +1,92 @@
+"""
+PostgreSQL backend that hands connections back to an in-process pool instead of closing them.
+
+Django's persistent connections (CONN_MAX_AGE) belong to the thread that opened them. Under ASGI
+each request's sync ORM work runs on a fresh executor thread, so those connections are never
+reused and every request pays the TCP/TLS/auth handshake again. This backend keeps one
+psycopg2 ThreadedConnectionPool per database alias, shared by all threads of the process.
+
+Enabled with DB_POOL=True (see rivo/settings.py). Pool size and checkout timeout come from the
+POOL entry of the database settings: {'min': ..., 'max': ..., 'timeout': seconds}.
+"""
+import threading
+import psycopg2.extras
+from psycopg2.pool import ThreadedConnectionPool
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.utils import OperationalError
+
+
+class ConnectionPool:
+    """ThreadedConnectionPool that waits for a free connection instead of raising when exhausted."""
+
+    def __init__(self, minconn, maxconn, timeout, **conn_params):
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **conn_params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(f'No database connection available within {self.timeout}s')
+        try:
+            return self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        try:
+            self._pool.putconn(connection, close=close)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                _pools[self.alias] = ConnectionPool(
+                    options.get('min', 1), options.get('max', 10), options.get('timeout', 10), **conn_params
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        if 'isolation_level' in self.settings_dict['OPTIONS']:
+            raise ImproperlyConfigured('The pooled backend does not support a custom isolation_level')
+        self.isolation_level = base.IsolationLevel.READ_COMMITTED
+
+        pool = self.get_pool(conn_params)
+        while True:
+            connection = pool.getconn()
+            if not connection.closed and (not self.settings_dict['CONN_HEALTH_CHECKS'] or _ping(connection)):
+                break
+            pool.putconn(connection, close=True)
+
+        # Same as the stock backend; harmless to repeat on a recycled connection
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # putconn rolls back an open transaction and discards a broken connection
+                _pools[self.alias].putconn(self.connection, close=bool(self.connection.closed))
+
+
+def _ping(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()  # Django switches autocommit on next, which needs an idle connection
+    except psycopg2.Error:
+        return False
+    return True
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'account',
@@ -55,11 +56,12 @@ LOGOUT_REDIRECT_URL = '/dashboard/login/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'account.authentication.CachedTokenAuthentication',
     ],
 }
 
 MIDDLEWARE = [
+    'rivo.middleware.QueryMetricsMiddleware',  # outermost, so session and auth queries count too
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -99,10 +101,34 @@ WSGI_APPLICATION = 'rivo.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Persistent connections: defaults suit gunicorn sync workers (one connection per worker, kept
+# for 10 minutes and pinged before reuse). Under ASGI set DB_POOL=True instead; Django's
+# persistent connections are per-thread and are not reused across async requests there.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+
 if os.environ.get('DATABASE_URL'):
     DATABASES = {
-        'default': dj_database_url.config(default=os.environ.get('DATABASE_URL'))
+        'default': dj_database_url.config(
+            default=os.environ.get('DATABASE_URL'),
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
     }
+    if DB_POOL:
+        # In-process pool (rivo/pooled_postgresql): Django "closes" after each request, returning the connection
+        DATABASES['default'].update({
+            'ENGINE': 'rivo.pooled_postgresql',
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'min': int(os.environ.get('DB_POOL_MIN', '1')),
+                'max': int(os.environ.get('DB_POOL_MAX', '10')),
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            },
+        })
+    # Transaction-mode poolers (PgBouncer, Supabase on port 6543) can't hold server-side cursors open
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True'
 else:
     DATABASES = {
         'default': {
@@ -112,6 +138,74 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'rivo'),
+    }
+}
+
+# Local memory is per process: a signal that deletes an entry only clears it in the worker that
+# handled the write. Caches invalidated that way fall back to short timeouts unless the backend is shared.
+CACHE_IS_SHARED = not CACHES['default']['BACKEND'].endswith(('LocMemCache', 'DummyCache'))
+
+
+# Chat summarization model: 'openai' or 'fake' (offline stand-in, see client/fake_llm.py)
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')
+
+# Shared OpenAI client (client/services.py). Keep the read timeout well under the gunicorn worker timeout.
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_READ_TIMEOUT = float(os.environ.get('OPENAI_READ_TIMEOUT', '20'))
+OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', '1'))
+
+# Circuit breaker: once LLM_BREAKER_FAILURE_RATE of at least LLM_BREAKER_MIN_CALLS calls in the last
+# LLM_BREAKER_WINDOW seconds fail, summaries are deferred to the job queue for LLM_BREAKER_COOLDOWN seconds
+LLM_BREAKER_FAILURE_RATE = float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5'))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10'))
+LLM_BREAKER_WINDOW = int(os.environ.get('LLM_BREAKER_WINDOW', '60'))
+LLM_BREAKER_COOLDOWN = int(os.environ.get('LLM_BREAKER_COOLDOWN', '30'))
+
+
+# Chat write-behind buffer (see chat/buffer.py). When enabled, stream acknowledges
+# messages immediately and inserts them with bulk_create every N messages or T ms.
+CHAT_WRITE_BUFFER = os.environ.get('CHAT_WRITE_BUFFER', 'False') == 'True'
+CHAT_BUFFER_SIZE = int(os.environ.get('CHAT_BUFFER_SIZE', '100'))
+CHAT_BUFFER_FLUSH_MS = int(os.environ.get('CHAT_BUFFER_FLUSH_MS', '200'))
+# Directory for the per-process append-only log; empty disables durability
+CHAT_BUFFER_LOG_DIR = os.environ.get('CHAT_BUFFER_LOG_DIR', '')
+
+
+# Instrumentation (rivo/middleware.py, rivo/metrics.py). QueryMetricsMiddleware logs a warning when a
+# view runs more SQL queries than its budget; rivo.testing asserts the same budgets in tests.
+# Keys are URL names as reported by request.resolver_match.view_name.
+DEFAULT_QUERY_BUDGET = int(os.environ.get('DEFAULT_QUERY_BUDGET', '20'))
+QUERY_BUDGETS = {
+    'account:login': 5,
+    'chat-stream': 12,  # Worst case is the first identity message: dedup lookup, client, StageCount, session link, message
+    'chat-stream-events': 12,
+    'chat-history': 3,
+    'client:list': 4,
+    'client:mine': 3,
+    'client:search': 4,
+    'client:mentions': 4,
+    'client:analytics': 5,
+    'client:bulk': 50,  # StageTransitionDaily.record writes once per (day, CSM, from, to) group
+    'client:detail': 20,
+    'client:history': 3,
+    'dashboard:login': 10,
+    'dashboard:logout': 3,
+    'dashboard:home': 6,
+    'dashboard:assign_client': 12,
+    'dashboard:client_detail': 5,
+    'dashboard:client_history': 4,
+}
+# /metrics is served to staff sessions, and to "Authorization: Bearer <METRICS_TOKEN>" when set
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,58 @@
+"""
+Helpers for asserting SQL query budgets from tests or scripts.
+
+Budgets come from settings.QUERY_BUDGETS (keyed by URL name, e.g. 'client:list'), the same
+table QueryMetricsMiddleware warns against in production:
+
+    with assert_query_budget('client:list'):
+        http.get('/api/v1/clients/', HTTP_AUTHORIZATION=...)
+
+    assert not unbudgeted_views(), 'every view needs an explicit budget'
+"""
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from .middleware import query_budget
+
+BUDGETED_APPS = ('client', 'chat', 'dashboard', 'account')
+
+
+@contextmanager
+def assert_max_queries(budget, label='block'):
+    with CaptureQueriesContext(connection) as ctx:
+        yield ctx
+    if len(ctx.captured_queries) > budget:
+        queries = '\n'.join(f"  {i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, 1))
+        raise AssertionError(f'{label} ran {len(ctx.captured_queries)} queries, budget is {budget}:\n{queries}')
+
+
+@contextmanager
+def assert_query_budget(view_name):
+    budget = query_budget(view_name)
+    if budget is None:
+        raise AssertionError(f'No query budget configured for {view_name}')
+    with assert_max_queries(budget, view_name) as ctx:
+        yield ctx
+
+
+def view_names(apps=BUDGETED_APPS):
+    """URL names of every view served by `apps`, namespaced the way resolver_match.view_name reports them."""
+    names = set()
+
+    def walk(patterns, namespace):
+        for p in patterns:
+            if isinstance(p, URLResolver):
+                walk(p.url_patterns, ':'.join(filter(None, [namespace, p.namespace])))
+            elif isinstance(p, URLPattern) and p.name:
+                owner = getattr(p.callback, '__module__', '') or ''
+                if owner.split('.')[0] in apps:
+                    names.add(':'.join(filter(None, [namespace, p.name])))
+
+    walk(get_resolver().url_patterns, '')
+    return names
+
+
+def unbudgeted_views(apps=BUDGETED_APPS):
+    return sorted(name for name in view_names(apps) if name not in settings.QUERY_BUDGETS)
@@ -0,0 +1,51 @@
+import uuid
+from django.test import TestCase, override_settings
+from account.models import User
+from client.models import Client
+from .testing import assert_query_budget, unbudgeted_views
+
+
+class QueryBudgetTests(TestCase):
+    def send(self, session_id, message, data_type='message'):
+        return self.client.post('/api/v1/chat/stream/', {
+            'session_id': str(session_id), 'message': message, 'data_type': data_type, 'message_uuid': str(uuid.uuid4()),
+        }, content_type='application/json')
+
+    def test_every_view_has_a_budget(self):
+        self.assertEqual(unbudgeted_views(), [])
+
+    def test_chat_stream_plain_message(self):
+        session_id = uuid.uuid4()
+        self.send(session_id, 'Ann Lee', 'name')
+        with assert_query_budget('chat-stream'):
+            self.assertEqual(self.send(session_id, 'What are the rates?').status_code, 201)
+
+    def test_chat_stream_first_identity_message(self):
+        with assert_query_budget('chat-stream'):
+            self.assertEqual(self.send(uuid.uuid4(), 'Ann@Example.com', 'email').status_code, 201)
+        self.assertTrue(Client.objects.filter(email='ann@example.com').exists())
+
+    def test_chat_stream_identity_message_completing_the_client(self):
+        session_id = uuid.uuid4()
+        self.send(session_id, 'Ann Lee', 'name')
+        self.send(session_id, 'ann@example.com', 'email')
+        with assert_query_budget('chat-stream'):
+            self.assertEqual(self.send(session_id, '(555) 010-2030', 'phone').status_code, 201)
+
+
+class MetricsViewTests(TestCase):
+    def test_anonymous_is_refused_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_non_staff_is_refused(self):
+        self.client.force_login(User.objects.create_user(username='csm', email='csm@example.com', password='x'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_staff_can_read(self):
+        self.client.force_login(User.objects.create_user(username='ops', email='ops@example.com', password='x', is_staff=True))
+        self.assertContains(self.client.get('/metrics'), 'rivo_llm_circuit_open')
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_scraper_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
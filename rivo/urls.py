@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -7,4 +8,5 @@ urlpatterns = [
     path('api/v1/account/', include('account.urls')),
     path('api/v1/clients/', include('client.urls')),
     path('dashboard/', include('dashboard.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]